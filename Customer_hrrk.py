@@ -1,169 +1,198 @@
 import streamlit as st
-import pandas as pd
+import numpy as np
 import plotly.express as px
-from pyecharts.charts import Pie
-from pyecharts import options as opts
-from streamlit_echarts import st_pyecharts
+import plotly.graph_objects as go
+
+import page_data
+from scatter_sampling import density_grid, density_sample, point_budget
+
+def customer_page(filtered_df, cube, price_box_stats, figures):
+    # filtered_df is a read-only view (dataset_view.DatasetView) of the rows selected in the sidebar, cube is the sales cube restricted to the same filters
+    # price_box_stats is the (stats, outliers) pair of box_stats.box_stats for the same filters
+    # figures (figure_cache.FigureScope) caches the charts per filter state, the build functions only run on a miss
+    # the metrics and the charts do not depend on each other: every section submits its computation to the chart threads
+    # and reserves its place in the layout, everything is shown in layout order at the end of the page
 
-def customer_page(filtered_df):
     # =================== 4️⃣ Key Metrics ===================
+    # Top-selling brand, model and color from the cube, unique customers from the 'Customer Name' column (see page_data.py)
+    metrics = figures.submit(page_data.customer_metrics, cube, filtered_df['Customer Name'])
+
     # Create four columns to display key metrics
-    col1, col2, col3, col4 = st.columns(4)
-    
-    # Display the top-selling brand based on the highest frequency in the 'Company' column
-    col1.metric('Top Selling Brand', filtered_df['Company'].value_counts().idxmax())
-    
-    # Display the top-selling model based on the highest frequency in the 'Model' column
-    col2.metric('Top Selling Model', filtered_df['Model'].value_counts().idxmax())
-    
-    # Display the top-selling color based on the highest frequency in the 'Color' column
-    col3.metric('Top Selling Color', filtered_df['Color'].value_counts().idxmax())
-    
-    # Display the number of unique customers based on the unique values in the 'Customer Name' column
-    col4.metric('Number of Unique Customers', filtered_df['Customer Name'].nunique())
+    metric_cols = st.columns(4)
 
    # =================== 5️⃣ Pie Chart and Bar Chart in Columns ===================
     col1, col2 = st.columns(2)
 
     # Pie Chart: Color Market Share
     with col1:
-        color_counts = filtered_df['Color'].value_counts()
-        color_data = [list(i) for i in zip(color_counts.index, color_counts)]
+        from streamlit_echarts import st_echarts
+
+        def build_color_share():
+            # pyecharts is only used by this chart, import it when the chart is built
+            from pyecharts.charts import Pie
+            from pyecharts import options as opts
+
+            color_counts = page_data.color_share(cube)
+            color_data = [list(i) for i in zip(color_counts.index, color_counts)]
         
-        # color mapping
-        color_map = {
-            'Pale White': '#f3f3f3',  
-            'Black': '#2c2c2c',       
-            'Red': '#ff5f5f'          
-        }
+            # color mapping
+            color_map = {
+                'Pale White': '#f3f3f3',  
+                'Black': '#2c2c2c',       
+                'Red': '#ff5f5f'          
+            }
         
-        pie_chart = (
-            Pie()
-            .add(
-                "Color Share",
-                color_data,
-                radius=["40%", "75%"],
-                label_opts=opts.LabelOpts(
-                    formatter="{b}: {d}%",
-                    position="outside",
-                    font_size=12,
-                    color="#f3f3f3"
-                )
-            )
-            .set_global_opts(
-                title_opts=opts.TitleOpts(
-                    title="Color Market Share",
-                    pos_top="5%",
-                    pos_left="center",
-                    title_textstyle_opts=opts.TextStyleOpts(
-                        font_size=16,
+            pie_chart = (
+                Pie()
+                .add(
+                    "Color Share",
+                    color_data,
+                    radius=["40%", "75%"],
+                    label_opts=opts.LabelOpts(
+                        formatter="{b}: {d}%",
+                        position="outside",
+                        font_size=12,
                         color="#f3f3f3"
                     )
-                ),
-                legend_opts=opts.LegendOpts(
-                    pos_left="left",
-                    orient="vertical",
-                    pos_top="middle",
-                    textstyle_opts=opts.TextStyleOpts(color="white")
+                )
+                .set_global_opts(
+                    title_opts=opts.TitleOpts(
+                        title="Color Market Share",
+                        pos_top="5%",
+                        pos_left="center",
+                        title_textstyle_opts=opts.TextStyleOpts(
+                            font_size=16,
+                            color="#f3f3f3"
+                        )
+                    ),
+                    legend_opts=opts.LegendOpts(
+                        pos_left="left",
+                        orient="vertical",
+                        pos_top="middle",
+                        textstyle_opts=opts.TextStyleOpts(color="white")
+                    )
                 )
             )
-        )
         
-        # Set color
-        for i, (color_name, _) in enumerate(color_data):
-            pie_chart.options.get('series')[0].get('data')[i]['itemStyle'] = {
-                'color': color_map.get(color_name, '#808080')  
-            }
+            # Set color
+            for i, (color_name, _) in enumerate(color_data):
+                pie_chart.options.get('series')[0].get('data')[i]['itemStyle'] = {
+                    'color': color_map.get(color_name, '#808080')  
+                }
+
+            return pie_chart.dump_options()
 
-        st_pyecharts(pie_chart, height="300px")
+        color_share = figures.submit_json('color_share', build_color_share)
 
 
     # Bar Chart: Brand Sales Comparison
     with col2:
-        # Get the top 10 brands with the highest sales count
-        company_counts = filtered_df['Company'].value_counts().head(10).reset_index()
-        company_counts.columns = ['Company', 'Sales Count']
+        def build_brand_sales():
+            # Get the top brands (SALES_TOP_N, 10 by default) with the highest sales count
+            company_counts = page_data.brand_sales(cube)
         
-        # Create a bar chart to compare brand sales
-        fig_bar = px.bar(
-            company_counts,
-            x='Company',
-            y='Sales Count',
-            color='Company',
-            color_discrete_sequence=px.colors.qualitative.Plotly  # Set the color sequence for the bars
-        )
+            # Create a bar chart to compare brand sales
+            fig_bar = px.bar(
+                company_counts,
+                x='Company',
+                y='Sales Count',
+                color='Company',
+                color_discrete_sequence=px.colors.qualitative.Plotly  # Set the color sequence for the bars
+            )
+
+            # Add a black border to the bars for better visualization
+            fig_bar.update_traces(marker=dict(line=dict(width=1, color='black')))
+
+            fig_bar.update_layout(
+                height=300,  # Set the height of the bar chart
+                title_x=0.2,  # Center the title horizontally
+                title_y=0.95,  # Set the vertical position of the title
+                title_text="Brand Sales Comparison",  # Set the title text
+                title_font=dict(size=20, color="#F3F3F3"),  # Set title font size and color
+                plot_bgcolor="rgba(0, 104, 201, 0.2)",  # Set the plot background color
+                paper_bgcolor="rgba(0, 104, 201, 0.2)",  # Set the paper background color
+                showlegend=False,  # Hide the legend for the bar chart
+                margin=dict(l=20, r=20, t=60, b=20)  # Adjust margins around the chart
+            )
+            return fig_bar
 
-        # Add a black border to the bars for better visualization
-        fig_bar.update_traces(marker=dict(line=dict(width=1, color='black')))
+        brand_sales = figures.submit_plotly('brand_sales', build_brand_sales)
 
-        fig_bar.update_layout(
-            height=300,  # Set the height of the bar chart
-            title_x=0.2,  # Center the title horizontally
+    # =================== 6️⃣ Price Analysis ===================
+    # Create a box plot to show the price distribution by brand
+    def build_price_box():
+        # the quartiles, whiskers and a capped outlier sample are precomputed, raw prices are not sent to the browser
+        stats, outliers = price_box_stats
+        box_colors = px.colors.qualitative.Plotly
+        fig_box = go.Figure()
+        for i, (company, row) in enumerate(stats.iterrows()):
+            color = box_colors[i % len(box_colors)]
+            fig_box.add_trace(go.Box(
+                x=[company], q1=[row["q1"]], median=[row["median"]], q3=[row["q3"]],
+                lowerfence=[row["lowerfence"]], upperfence=[row["upperfence"]],
+                name=company, marker_color=color, boxpoints=False
+            ))
+            company_outliers = outliers.loc[outliers["Company"] == company, "Price ($)"]
+            if len(company_outliers):
+                fig_box.add_trace(go.Scatter(
+                    x=[company] * len(company_outliers), y=company_outliers, mode="markers",
+                    name=company, marker=dict(color=color, size=4), hovertemplate="%{y}<extra></extra>"
+                ))
+        fig_box.update_yaxes(title_text="Price ($)")
+        fig_box.update_xaxes(title_text="Company")
+        fig_box.update_layout(
+            height=400,  # Set the height of the box plot
+            title_x=0.35,  # Center the title horizontally
             title_y=0.95,  # Set the vertical position of the title
-            title_text="Brand Sales Comparison",  # Set the title text
+            title_text="Price Distribution by Brand",  # Set the title text
             title_font=dict(size=20, color="#F3F3F3"),  # Set title font size and color
             plot_bgcolor="rgba(0, 104, 201, 0.2)",  # Set the plot background color
             paper_bgcolor="rgba(0, 104, 201, 0.2)",  # Set the paper background color
-            showlegend=False,  # Hide the legend for the bar chart
+            showlegend=False,  # Hide the legend for the box plot
             margin=dict(l=20, r=20, t=60, b=20)  # Adjust margins around the chart
         )
-        st.plotly_chart(fig_bar, use_container_width=True)  # Display the bar chart
+        return fig_box
 
-    # =================== 6️⃣ Price Analysis ===================
-    # Create a box plot to show the price distribution by brand
-    fig_box = px.box(filtered_df, x="Company", y="Price ($)", color="Company")
-    fig_box.update_layout(
-        height=400,  # Set the height of the box plot
-        title_x=0.35,  # Center the title horizontally
-        title_y=0.95,  # Set the vertical position of the title
-        title_text="Price Distribution by Brand",  # Set the title text
-        title_font=dict(size=20, color="#F3F3F3"),  # Set title font size and color
-        plot_bgcolor="rgba(0, 104, 201, 0.2)",  # Set the plot background color
-        paper_bgcolor="rgba(0, 104, 201, 0.2)",  # Set the paper background color
-        showlegend=False,  # Hide the legend for the box plot
-        margin=dict(l=20, r=20, t=60, b=20)  # Adjust margins around the chart
-    )
-    st.plotly_chart(fig_box, use_container_width=True)  # Display the box plot
+    price_box = figures.submit_plotly('price_box', build_price_box)
+    price_box_area = st.container()
 
     # =================== 7️⃣ Heatmap Analysis ===================
     # Create a heatmap to show the relationship between Gender and Body Style preferences
-    heatmap_data = filtered_df.groupby(["Gender", "Body Style"]).size().reset_index(name="Count")
-    fig_heatmap = px.density_heatmap(
-        heatmap_data,
-        x="Body Style",
-        y="Gender",
-        z="Count",  # The count of each gender-body style combination
-        color_continuous_scale="Blues"  # Set the color scale for the heatmap
-    )
-    fig_heatmap.update_layout(
-        height=300,  # Set the height of the heatmap
-        title_x=0.35,  # Center the title horizontally
-        title_y=0.95,  # Set the vertical position of the title
-        title_text="Gender vs. Body Style Preference",  # Set the title text
-        title_font=dict(size=20, color="#F3F3F3"),  # Set title font size and color
-        plot_bgcolor="rgba(0, 104, 201, 0.2)",  # Set the plot background color
-        paper_bgcolor="rgba(0, 104, 201, 0.2)",  # Set the paper background color
-        showlegend=False  # Hide the legend for the heatmap
-    )
-    st.plotly_chart(fig_heatmap, use_container_width=True)  # Display the heatmap
+    def build_gender_body_style():
+        heatmap_data = page_data.gender_body_style(cube)
+        fig_heatmap = px.density_heatmap(
+            heatmap_data,
+            x="Body Style",
+            y="Gender",
+            z="Count",  # The count of each gender-body style combination
+            color_continuous_scale="Blues"  # Set the color scale for the heatmap
+        )
+        fig_heatmap.update_layout(
+            height=300,  # Set the height of the heatmap
+            title_x=0.35,  # Center the title horizontally
+            title_y=0.95,  # Set the vertical position of the title
+            title_text="Gender vs. Body Style Preference",  # Set the title text
+            title_font=dict(size=20, color="#F3F3F3"),  # Set title font size and color
+            plot_bgcolor="rgba(0, 104, 201, 0.2)",  # Set the plot background color
+            paper_bgcolor="rgba(0, 104, 201, 0.2)",  # Set the paper background color
+            showlegend=False  # Hide the legend for the heatmap
+        )
+        return fig_heatmap
+
+    gender_body_style = figures.submit_plotly('gender_body_style', build_gender_body_style)
+    heatmap_area = st.container()
 
        # =================== 8⃣ Income-Price Analysis ==================
     # Generate a scatter plot 
-    try:
-        fig_scatter = px.scatter(
-            filtered_df,
-            x="Annual Income",  # X-axis represents the annual income of customers
-            y="Price ($)",  # Y-axis represents the price of the car purchased
-            hover_data=["Customer Name", "Company", "Model"],  # Show customer details on hover
-            color_discrete_sequence=["#1f77b4"]  # Set the color for the scatter points
-        )
-        
+    # Above the point budget only a density-aware sample is sent to the browser (WebGL traces),
+    # or the points are aggregated into a density grid. Full resolution is loaded for a box-selected region.
+    def style_scatter(fig, title):
         # Customize the layout of the scatter plot
-        fig_scatter.update_layout(
+        fig.update_layout(
             height=500,  # Set the plot height
             title_x=0.4,  # Center the title horizontally
             title_y=0.95,  # Set the vertical position of the title
-            title_text="Income vs Price",  # Set the plot title
+            title_text=title,  # Set the plot title
             title_font=dict(size=20, color="#F3F3F3"),  # Configure title font size and color
             plot_bgcolor="rgba(0, 104, 201, 0.2)",  # Set the background color of the plot area
             paper_bgcolor="rgba(0, 104, 201, 0.2)",  # Set the background color of the entire figure
@@ -179,9 +208,84 @@ def customer_page(filtered_df):
             ),
             margin=dict(l=20, r=20, t=80, b=20)  # Adjust plot margins
         )
-        
-        # Display the scatter plot in the Streamlit app
-        st.plotly_chart(fig_scatter, use_container_width=True)
+        return fig
+
+    def scatter(points, title, budget):
+        # at most `budget` points, thinned where they are dense
+        sample = points.take(density_sample(points["Annual Income"], points["Price ($)"], budget))
+        if len(sample) < len(points):
+            title = f"{title} ({len(sample):,} of {len(points):,} points)"
+        fig = px.scatter(
+            sample.to_frame(["Annual Income", "Price ($)", "Customer Name", "Company", "Model"]),
+            x="Annual Income",  # X-axis represents the annual income of customers
+            y="Price ($)",  # Y-axis represents the price of the car purchased
+            hover_data=["Customer Name", "Company", "Model"],  # Show customer details on hover
+            color_discrete_sequence=["#1f77b4"],  # Set the color for the scatter points
+            render_mode="webgl" if len(points) > budget else "auto"  # WebGL once the data is large
+        )
+        return style_scatter(fig, title)
+
+    income_price = None
+    try:
+        budget = point_budget()
+        mode = "Points"
+        if len(filtered_df) > budget:
+            mode = st.radio("Income vs Price view", ["Points", "Density"], horizontal=True)
+
+        if mode == "Density":
+            # counts on a grid, the payload does not grow with the number of rows
+            def build_density():
+                x_centers, y_centers, counts = density_grid(filtered_df["Annual Income"], filtered_df["Price ($)"])
+                fig_density = go.Figure(go.Heatmap(
+                    x=x_centers,
+                    y=y_centers,
+                    z=np.where(counts > 0, counts, np.nan),  # leave empty cells transparent
+                    colorscale="Blues",
+                    hovertemplate="Income: $%{x:,.0f}<br>Price: $%{y:,.0f}<br>Sales: %{z}<extra></extra>"
+                ))
+                return style_scatter(fig_density, "Income vs Price")
+
+            income_price = figures.submit_plotly('income_price_density', build_density)
+        else:
+            income_price = figures.submit_plotly(('income_price', budget), lambda: scatter(filtered_df, "Income vs Price", budget))
+
+    except Exception as e:
+        # Display an error message if an exception occurs
+        st.error(f"Analysis error: {str(e)}")
+
+    # =================== Show the page in layout order ===================
+    metrics = metrics.result()
+    metric_cols[0].metric('Top Selling Brand', metrics['top_brand'])
+    metric_cols[1].metric('Top Selling Model', metrics['top_model'])
+    metric_cols[2].metric('Top Selling Color', metrics['top_color'])
+    metric_cols[3].metric('Number of Unique Customers', metrics['unique_customers'])
+
+    with col1:
+        st_echarts(options=color_share.result(), height="300px")
+    with col2:
+        st.plotly_chart(brand_sales.result(), use_container_width=True)  # Display the bar chart
+    with price_box_area:
+        st.plotly_chart(price_box.result(), use_container_width=True)  # Display the box plot
+    with heatmap_area:
+        st.plotly_chart(gender_body_style.result(), use_container_width=True)  # Display the heatmap
+
+    if income_price is None:
+        return
+    try:
+        if mode == "Density":
+            st.plotly_chart(income_price.result(), use_container_width=True)
+        else:
+            # Display the scatter plot in the Streamlit app, a box selection reruns with the selected region
+            event = st.plotly_chart(income_price.result(), use_container_width=True, key="income_price_scatter",
+                                    on_select="rerun", selection_mode="box")
+
+            boxes = event.selection.get("box", []) if event else []
+            if boxes and len(filtered_df) > budget:
+                (x0, x1), (y0, y1) = sorted(boxes[0]["x"]), sorted(boxes[0]["y"])
+                region = filtered_df[filtered_df["Annual Income"].between(x0, x1) & filtered_df["Price ($)"].between(y0, y1)]
+                st.plotly_chart(scatter(region, "Selected Region", budget), use_container_width=True)
+            elif len(filtered_df) > budget:
+                st.caption("Box-select a region of the chart to load it at full resolution.")
 
     except Exception as e:
         # Display an error message if an exception occurs
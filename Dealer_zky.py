@@ -1,24 +1,20 @@
 
 
-def dealer_page(filtered_df):
+def dealer_page(filtered_df, cube, figures):
+    #all dealer charts are rolled up from the cube (restricted to the sidebar filters), filtered_df is not scanned
+    #the data of every chart comes from page_data.py, the chart functions build the figures, figures (figure_cache.FigureScope) caches them per filter state
     import streamlit as st
-    import pandas as pd
     import plotly.express as px
-    import seaborn as sbn
-    import matplotlib.pyplot as plt
+
+    import page_data
+    from ranking import ranking_size
 
             
     ###############pic1 dealer sales volume################
-    def plot_dealer_sales(filtered_df):
-
-        #calculate dealer sales volume
-        dealer_sales = filtered_df.groupby('Dealer_Name').size().reset_index(name='Sales')
+    def plot_dealer_sales(cube):
 
-        #sort
-        dealer_sales = dealer_sales.sort_values('Sales', ascending=True)
-        top10_dealer = dealer_sales.head(10)
-
-        top10_dealer['shorter_name'] = top10_dealer['Dealer_Name'].apply(lambda x: x[:20] + '...' if len(x) > 20 else x)
+        #best selling dealers with the short names, ranked without sorting all dealers (see page_data.py)
+        top10_dealer = page_data.dealer_sales(cube)
 
         #create bar chart
         fig_dealer = px.bar(
@@ -26,7 +22,7 @@ def dealer_page(filtered_df):
             y='shorter_name', 
             x='Sales', 
             orientation='h', 
-            title='TOP10 Dealer Sales Performance',
+            title=f'TOP{ranking_size()} Dealer Sales Performance',
             labels={'shorter_name': 'Dealer Name', 'Sales': 'Sales Count'},
             text_auto=True,  #show sales volume on bars
             color='Dealer_Name',  #assign different colors to each dealer
@@ -47,27 +43,14 @@ def dealer_page(filtered_df):
             yaxis_title=None
         )
 
-        #show chart
-        st.plotly_chart(fig_dealer, use_container_width=True)
+        return fig_dealer
 
 
     ############ pic2 car brand and model #############
-    def plot_company_sales(filtered_df):
-
-        #calculate sales data groupby company and model
-        model_sales = filtered_df.groupby(['Company', 'Model'], as_index=False).size()
-        model_sales = model_sales.rename(columns={'size': 'model_nb'})
+    def plot_company_sales(cube):
 
-        #calculate total sales for each company
-        company_total_sales = model_sales.groupby('Company', as_index=False)['model_nb'].sum()
-        company_total_sales = company_total_sales.rename(columns={'model_nb': 'Total_Sales'})
-
-        # find top 10
-        top10_company = company_total_sales.head(10)
-
-        #merge total sales with original data and sort by number
-        model_sales = model_sales.merge(top10_company, on='Company')
-        model_sales = model_sales.sort_values(['Total_Sales', 'model_nb'], ascending=[False, False])
+        #model sales of the best selling companies with the company totals, sorted by number (see page_data.py)
+        model_sales = page_data.company_model_sales(cube)
 
         #set colors
         unique_companies = model_sales['Company'].unique()
@@ -87,7 +70,7 @@ def dealer_page(filtered_df):
             x='model_nb', 
             color='Company',  
             orientation='h', 
-            title='TOP10 Company Model Sales Scale', 
+            title=f'TOP{ranking_size()} Company Model Sales Scale', 
             labels={'model_nb': 'Sales Count', 'Company': 'Company'}, 
             text_auto=True,  #show sales numbers
             text='Model',  # show model names on the bars
@@ -113,26 +96,13 @@ def dealer_page(filtered_df):
             yaxis_title=None  #remove y title
         )
 
-        #show chart
-        st.plotly_chart(fig_company, use_container_width=True)
+        return fig_company
 
 
     #############pic3 map and bar chart #####################
-    def map_region_sales(filtered_df):
-        #map city to state
-        city_to_state = {
-            'Middletown': 'OH',  
-            'Aurora': 'IL',     
-            'Greenville': 'SC',  
-            'Pasco': 'WA',     
-            'Janesville': 'WI',
-            'Scottsdale': 'AZ', 
-            'Austin': 'TX'     
-        }
-        
-        #calculate sales for each region
-        region_sales = filtered_df.groupby('Dealer_Region').size().reset_index(name='Sales')
-        region_sales['State'] = region_sales['Dealer_Region'].map(city_to_state)
+    def map_region_sales(cube):
+        #calculate sales for each region, with the state of its city
+        region_sales = page_data.region_sales(cube)
         
         #sort sales by volume in ascending order
         region_sales_sorted = region_sales.sort_values('Sales', ascending=True)
@@ -211,27 +181,16 @@ def dealer_page(filtered_df):
             margin=dict(l=20, r=20, t=60, b=20)
         )
 
-        #show chart
-        st.plotly_chart(fig, use_container_width=True)
+        return fig
 
 
 
     ##################pic4 line chart####################
-    def line_region_sales(filtered_df):  
+    def line_region_sales(cube):  
        
         ##regional market share
-        #parse date, extract year and month
-        filtered_df['Date'] = pd.to_datetime(filtered_df['Date'])
-        filtered_df['YearMonth'] = filtered_df['Date'].dt.to_period('M').astype(str)  #convert to "YYYY-MM" format
-
-        #calculate sales by month and dealer region
-        region_monthly_sales = filtered_df.groupby(['YearMonth', 'Dealer_Region']).size().reset_index(name='Sales')
-
-        #calculate sales per month
-        monthly_total_sales = region_monthly_sales.groupby('YearMonth')['Sales'].transform('sum')
-
-        #calculate sales share
-        region_monthly_sales['SalesShare'] = (region_monthly_sales['Sales'] / monthly_total_sales) * 100
+        #sales share of each dealer region per "YYYY-MM" month
+        region_monthly_sales = page_data.region_monthly_share(cube)
 
         #set line fig
         fig_line = px.line(
@@ -257,46 +216,47 @@ def dealer_page(filtered_df):
             height=400
         )
 
-        #display chart
-        st.plotly_chart(fig_line, use_container_width=True)
+        return fig_line
 
 
     ######################  page layout  #####################
-    
-    #find top selling dealer
-    top_selling_dealer = filtered_df['Dealer_Name'].value_counts().idxmax()
-    #find top selling region
-    top_selling_region = filtered_df['Dealer_Region'].value_counts().idxmax()
-    #count unique company brand
-    unique_company = filtered_df['Company'].nunique()
-    #count dealer 
-    unique_dealers = filtered_df['Dealer_Name'].nunique()
+
+    #the metrics and the four charts do not depend on each other, they are all submitted first
+    #and computed concurrently on the chart threads, then shown in layout order
+    metrics = figures.submit(page_data.dealer_metrics, cube)
+    dealer_sales = figures.submit_plotly('dealer_sales', lambda: plot_dealer_sales(cube))
+    company_sales = figures.submit_plotly('company_sales', lambda: plot_company_sales(cube))
+    region_map = figures.submit_plotly('region_map', lambda: map_region_sales(cube))
+    region_share = figures.submit_plotly('region_share', lambda: line_region_sales(cube))
+
+    #top selling dealer and region, number of company brands and dealers
+    metrics = metrics.result()
 
     #show three numbers
     col1, col2, col3 , col4 = st.columns(4)
     with col1:
-        st.metric('Top Selling Dealer', f'{top_selling_dealer[:11]}')
+        st.metric('Top Selling Dealer', f"{metrics['top_dealer'][:11]}")
     with col2:
-        st.metric('Top Selling Region', f'{top_selling_region}')
+        st.metric('Top Selling Region', f"{metrics['top_region']}")
     with col3:
-         st.metric('Dealer Brand Count', f'{unique_company}')
+         st.metric('Dealer Brand Count', f"{metrics['companies']}")
     with col4:
-        st.metric('Number of Dealers', f'{unique_dealers}')
+        st.metric('Number of Dealers', f"{metrics['dealers']}")
 
 
     #show dealer and company sales
     col_dealer_sales,col_company_sales = st.columns(2)
     with col_dealer_sales:
-        plot_dealer_sales(filtered_df)
+        st.plotly_chart(dealer_sales.result(), use_container_width=True)
     with col_company_sales:
-        plot_company_sales(filtered_df)
+        st.plotly_chart(company_sales.result(), use_container_width=True)
 
 
     #show map
-    map_region_sales(filtered_df)
+    st.plotly_chart(region_map.result(), use_container_width=True)
 
     #show line chart
-    line_region_sales(filtered_df)
+    st.plotly_chart(region_share.result(), use_container_width=True)
 
 
 
@@ -1,14 +1,13 @@
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.graph_objects as go
-import plotly.express as px
-from sklearn.linear_model import LinearRegression
 import numpy as np
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from histograms import kde_counts
 
 
-def overview_page(filtered_df):
+def overview_page(filtered_df, profile):
+    # profile is the data_profile.DataProfile of the raw file, computed once per file version
     # Welcome title and purpose of this App
     st.title('Welcome to the Car Sales Analysis App')
     st.write("""
@@ -16,42 +15,53 @@ def overview_page(filtered_df):
     - Through interactive charts and tables, users can deep dive into the data and draw insights.
     """)
 
-    # read data
-    df = pd.read_csv("car sales.csv")
-
     # data overview
     st.header('Data Overview')
-    st.dataframe(df.head(3)) # show the first 3 lines as sample
+    st.dataframe(profile.sample) # show the first 3 lines as sample
 
     # data cleaning and sanity check
     with st.expander('Data Cleaning and Sanity Checking'):
         st.subheader('Missing Value Check')
 
-        # Replace empty strings with NaN
-        df['Customer Name'] = df['Customer Name'].replace('', pd.NA)
-
-        # Clean invisible characters
-        df['Customer Name'] = df['Customer Name'].str.strip().replace(r'[\n\t\r]', '', regex=True)
-
-        # Ensure column is string type
-        df['Customer Name'] = df['Customer Name'].astype(str)
-
-        missing_values = df.isnull().sum()
+        # empty and whitespace-only strings are counted as missing
+        missing_values = profile.missing
         st.write(missing_values[missing_values > 0]) # only show the missing columns
 
         # check the number of gender
-        gender_counts = df['Gender'].value_counts()
         st.write("Unique Values in 'Gender' column:")
-        st.write(gender_counts)  
+        st.write(profile.gender_counts)  
 
         # use histogram to check outliers in numerical columns
+        # bins and density curves are precomputed in the profile, only they are sent to the browser
         st.write('Outliers in Numerical Columns')
-        num_columns = ['Annual Income', 'Price ($)']
-        fig, axes = plt.subplots(1, len(num_columns), figsize = (15, 5))
-        for i, col in enumerate(num_columns):
-            sns.histplot(df[col], kde = True, ax = axes[i])
-            axes[i].set_title(f'Histogram of {col}')
-        st.pyplot(fig)
+        num_columns = list(profile.histograms)
+        fig = make_subplots(rows = 1, cols = len(num_columns),
+                            subplot_titles = [f'Histogram of {col}' for col in num_columns])
+        for i, col in enumerate(num_columns, start = 1):
+            counts, edges = profile.histograms[col]
+            widths = np.diff(edges)
+            fig.add_trace(go.Bar(x = edges[:-1] + widths / 2, y = counts, width = widths,
+                                 name = col, marker_color = 'cadetblue'), row = 1, col = i)
+
+            # density curve scaled to the count axis of the histogram
+            grid, density = profile.densities[col]
+            fig.add_trace(go.Scatter(x = grid, y = kde_counts(grid, density, counts.sum(), widths.mean()),
+                                     name = f'{col} density', mode = 'lines',
+                                     line = dict(color = 'goldenrod')), row = 1, col = i)
+            fig.update_xaxes(title_text = col, row = 1, col = i)
+            fig.update_yaxes(title_text = 'Count', row = 1, col = i)
+
+        fig.update_layout(
+            height = 350,
+            bargap = 0,
+            showlegend = False,
+            plot_bgcolor = "rgba(0, 104, 201, 0)",
+            paper_bgcolor = "rgba(0, 104, 201, 0.2)",
+            margin = dict(l = 20, r = 20, t = 60, b = 20))
+        st.plotly_chart(fig, use_container_width = True)
+
+        # outlier bounds (1.5 x IQR beyond the quartiles) and the number of rows outside them
+        st.write(profile.outlier_bounds)
 
  
     
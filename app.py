@@ -1,45 +1,24 @@
-import subprocess 
-import sys 
-import os
-
-def install_package(package):
-    try:
-        subprocess.check_call([sys.executable, "-m", "pip", "install", package])
-        print(f"Successfully installed {package}")
-    except subprocess.CalledProcessError as e:
-        print(f"Failed to install {package}: {e}")
-
-def check_and_install_packages():
-    # Check if the flag file exists
-    flag_file = 'packages_installed.txt'
-    if not os.path.exists(flag_file):
-        print("First run, installing required packages, please wait...")
-        # If the flag file does not exist, install the packages
-        packages = ["streamlit-option-menu", "pyarrow", "pyecharts", "streamlit-echarts", "scikit-learn"]
-        for package in packages:
-            install_package(package)
-        
-        # Check and install plotly separately
-        try:
-            import plotly
-        except ImportError:
-            print("Plotly not found, installing...")
-            install_package("plotly")
-
-        # Create the flag file after installation is complete
-        with open(flag_file, 'w') as f:
-            f.write('Packages installed')
-        print("All packages have been successfully installed.")
-    else:
-        print("Packages have already been installed, skipping installation step.")
-
-# Check and install packages
-check_and_install_packages()
-
-import pandas as pd
+import contextlib
+
 import streamlit as st
+
+# dependencies are checked once per process at import time, reruns never touch pip or the filesystem
+from dependencies import MISSING_PACKAGES, missing_packages_message
+
+if MISSING_PACKAGES:
+    st.error(missing_packages_message(MISSING_PACKAGES))
+    st.stop()
+
 from streamlit_option_menu import option_menu
-from sklearn.linear_model import LinearRegression
+from data_loader import (load_chart_executor, load_data_profile, load_dataset_refresher, load_figure_cache,
+                         load_filter_index, load_latency_stats, load_price_box_stats, load_query_backend,
+                         load_sales_data)
+from dataset_view import DatasetView, enable_copy_on_write, write_guard, write_guard_enabled
+from figure_cache import FigureScope
+from instrumentation import InstrumentedSource, RerunProfile, debug_panel_enabled, render_debug_panel
+
+#derived frames share memory with the cached data until they are written to
+enable_copy_on_write()
 
 
 
@@ -171,52 +150,74 @@ st.markdown(f'<style>{test_css}</style>', unsafe_allow_html=True)
 
 #############import data#################
 
-#read data
-df = pd.read_csv("car sales.csv")
+#row-level columns read by each page, the snapshot is loaded with column projection
+#(aggregates come from the query backend, see query_backend.py, filters from the bitmap index, see filter_index.py)
+FILTER_COLUMNS = ["Year", "Dealer_Region"]
+PAGE_COLUMNS = {
+    "Overview": [],
+    "Sales Trend": ["Price ($)"],
+    "Customer": ["Customer Name", "Company", "Model", "Annual Income", "Price ($)"],
+    "Dealer": [],
+}
 
-#data preprocessing
-#convert date format
-df['Date'] = pd.to_datetime(df['Date'], format='%d/%m/%Y', errors='coerce')
-df = df.dropna(subset=["Date"])
-df['Year'] = df['Date'].dt.year.astype(str)
-df['Quarter'] = df['Date'].dt.quarter.astype(str)
-df['Month'] = df['Date'].dt.month.astype(str)
+#every step of the rerun is timed (see instrumentation.py)
+profile = RerunProfile(selected)
+
+#read data, parsed once per process and shared by all sessions (see data_loader.py)
+#new data is built by a background thread, the rerun keeps the version published when it started (see refresh.py)
+with profile.span("load data"):
+    dataset = load_dataset_refresher([FILTER_COLUMNS + columns for columns in PAGE_COLUMNS.values()]).current()
+    df = load_sales_data(columns=FILTER_COLUMNS + PAGE_COLUMNS[selected], version=dataset.version)
+    filter_index = load_filter_index(version=dataset.version)
 
 
 #general filters
 st.sidebar.header("Filters")
-selected_year = st.sidebar.multiselect("Select Year", df["Year"].unique(), default=df["Year"].unique().tolist())
-selected_region = st.sidebar.multiselect("Select Dealer Region", df["Dealer_Region"].unique(), default=df["Dealer_Region"].unique().tolist())
-
-#set default values if filters are empty
-if not selected_year:
-    selected_year = df["Year"].unique().tolist()
-if not selected_region:
-    selected_region = df["Dealer_Region"].unique().tolist()
-
-#apply filters
-filtered_df = df[(df["Year"].isin(selected_year)) & (df["Dealer_Region"].isin(selected_region))]
+selected_year = st.sidebar.multiselect("Select Year", filter_index.values("Year"), default=filter_index.values("Year"))
+selected_region = st.sidebar.multiselect("Select Dealer Region", filter_index.values("Dealer_Region"), default=filter_index.values("Dealer_Region"))
 
+#empty filters select everything
+filters = {"Year": selected_year, "Dealer_Region": selected_region}
 
+#apply filters, pages get a read-only view of the shared frame (see dataset_view.py)
+with profile.span("filter"):
+    filtered_df = DatasetView(filter_index.select(df, filters))
+    cube = InstrumentedSource(load_query_backend(version=dataset.version), profile).where(filters)
 
-#########switch to "Overview" page  by TIAN Chen ##############
-if selected == "Overview":
-    from  Overview_tc import (overview_page)
-    overview_page(filtered_df)
-    
-#########switch to Sales Trend Analysis page by TIAN Chen #########
-if selected == "Sales Trend":
-    from Sales_Trend_tc import (sales_trend_page)
-    sales_trend_page(filtered_df)
-
-#########switch to Customer page by HAN Renruike #############
-if selected == "Customer":
-    from Customer_hrrk import (customer_page)
-    customer_page(filtered_df)  
+#charts are cached per dataset version, page and filters and built concurrently on the chart threads (see figure_cache.py)
+figures = FigureScope(load_figure_cache(), dataset.version, selected, filters, profile, load_chart_executor())
 
-########switch to Dealer page by ZHU Keye #############
-if selected == "Dealer":
-     from Dealer_zky import (dealer_page)
-     dealer_page(filtered_df) 
 
 
+#pages only read the shared frame, SALES_WRITE_GUARD=1 fails the rerun if one modifies it
+page_guard = write_guard(df, "sales frame") if write_guard_enabled() else contextlib.nullcontext()
+with page_guard, profile.span("render"):
+    #########switch to "Overview" page  by TIAN Chen ##############
+    if selected == "Overview":
+        from  Overview_tc import (overview_page)
+        #the profile of the CSV the published version was built from (its signature is (CSV signature, appended parts))
+        overview_page(filtered_df, load_data_profile(signature=dataset.signature[0]))
+    
+    #########switch to Sales Trend Analysis page by TIAN Chen #########
+    if selected == "Sales Trend":
+        from Sales_Trend_tc import (sales_trend_page)
+        sales_trend_page(filtered_df, cube, figures)
+
+    #########switch to Customer page by HAN Renruike #############
+    if selected == "Customer":
+        from Customer_hrrk import (customer_page)
+        with profile.span("aggregate/price_box_stats"):
+            price_box_stats = load_price_box_stats(filters, version=dataset.version)
+        customer_page(filtered_df, cube, price_box_stats, figures)  
+
+    ########switch to Dealer page by ZHU Keye #############
+    if selected == "Dealer":
+         from Dealer_zky import (dealer_page)
+         dealer_page(filtered_df, cube, figures) 
+
+
+#record the rerun latencies, SALES_DEBUG_PANEL=1 shows them in the sidebar
+latency_stats = load_latency_stats()
+total_ms = profile.finish(latency_stats)
+if debug_panel_enabled():
+    render_debug_panel(profile, latency_stats, total_ms)
@@ -0,0 +1,97 @@
+"""Import-time budget report for the dashboard modules.
+
+Every target is imported in a fresh interpreter with ``python -X importtime``
+after the shared baseline (streamlit and pandas, which every worker loads
+anyway), so the numbers are what the target adds to a cold worker. For each
+target the report lists the total cumulative import time and the heaviest
+top-level packages it pulls in.
+
+Usage (from the repository root):
+
+    python benchmarks/import_budget.py            # all targets
+    python benchmarks/import_budget.py --json     # machine readable, to compare commits
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BASELINE = ["streamlit", "pandas"]
+
+# page modules, plus the libraries each page imports only when the chart renders
+TARGETS = {
+    "data_loader": ["data_loader"],
+    "Overview_tc": ["Overview_tc"],
+    "Sales_Trend_tc": ["Sales_Trend_tc"],
+    "Customer_hrrk": ["Customer_hrrk"],
+    "Customer_hrrk (render)": ["pyecharts.charts", "streamlit_echarts"],
+    "Dealer_zky": ["Dealer_zky", "plotly.express"],
+}
+
+MARKER = "--import-budget-baseline-done--"
+
+
+def measure(modules, baseline=BASELINE):
+    """Return (total microseconds, {module: cumulative microseconds}) for ``modules``.
+
+    The module breakdown holds the top-level imports and their direct imports.
+    """
+    code = "; ".join(
+        [f"import {name}" for name in baseline]
+        + [f"import sys; sys.stderr.write({MARKER!r} + '\\n')"]
+        + [f"import {name}" for name in modules]
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+    )
+    lines = proc.stderr.split(MARKER, 1)[1].splitlines()
+
+    total = 0
+    packages = {}
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        # nesting adds two spaces after the separator, top-level imports carry the full cost
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0:
+            total += int(cumulative)
+        if depth <= 1 and name.strip() not in modules:
+            packages[name.strip()] = packages.get(name.strip(), 0) + int(cumulative)
+    return total, packages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--top", type=int, default=5, help="number of packages listed per target")
+    args = parser.parse_args(argv)
+
+    report = {}
+    for target, modules in TARGETS.items():
+        total, packages = measure(modules)
+        report[target] = {
+            "total_ms": round(total / 1000, 1),
+            "packages_ms": {name: round(us / 1000, 1) for name, us in
+                            sorted(packages.items(), key=lambda item: -item[1])},
+        }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{'target':<26}{'total ms':>10}  heaviest imports (cumulative ms)")
+    for target, row in report.items():
+        top = ", ".join(f"{name} {ms:.0f}" for name, ms in list(row["packages_ms"].items())[:args.top])
+        print(f"{target:<26}{row['total_ms']:>10.1f}  {top}")
+
+
+if __name__ == "__main__":
+    main()
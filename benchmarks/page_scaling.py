@@ -0,0 +1,245 @@
+"""Load and page latency of the dashboard at synthetic data scales.
+
+For every scale a fresh interpreter loads a synthetic CSV (see
+synthetic_data.py, generated once and reused from ``--data-dir``) through
+data_loader exactly as the app does: snapshot build, snapshot load, query
+backend, filter index and raw profile. It then renders every page headlessly
+(Streamlit in bare mode, no server or browser) for two filter states, all rows
+and one year in two regions, with an empty figure cache so every chart is
+built, and times the page computations alone (page_data.py) before each page
+render. Each step reports its wall time and the peak memory it allocated
+(tracemalloc, which covers pandas and numpy buffers but not the Arrow ones),
+and the interpreter reports its peak RSS.
+
+Usage (from the repository root):
+
+    python benchmarks/page_scaling.py                         # 100k, 1M and 10M rows
+    python benchmarks/page_scaling.py --rows 100000 --json > before.json
+    python benchmarks/page_scaling.py --rows 100000 --compare before.json
+    python benchmarks/page_scaling.py --rows 1000000 --scale-cardinality  # ~1.2k dealers
+
+Generating and loading 10M rows takes several minutes and a few GB of memory.
+Timings include the tracemalloc overhead, use ``--no-memory`` for plain timings.
+Charts are built on ``SALES_CHART_WORKERS`` threads like in the app, set it to 1
+to time them in sequence.
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DATA_DIR = os.path.join(REPO_ROOT, "benchmarks", "data")
+
+SCALES = [100_000, 1_000_000, 10_000_000]
+
+# from CUBE_RATIO_ROWS rows on, the sales cube must have at most one cell per CUBE_RATIO rows
+# (its cells are bounded by the dimension cardinalities, see cube.py)
+CUBE_RATIO_ROWS = 1_000_000
+CUBE_RATIO = 5
+
+# same projections as app.py
+FILTER_COLUMNS = ["Year", "Dealer_Region"]
+PAGE_COLUMNS = {
+    "Overview": [],
+    "Sales Trend": ["Price ($)"],
+    "Customer": ["Customer Name", "Company", "Model", "Annual Income", "Price ($)"],
+    "Dealer": [],
+}
+
+
+def page_computations(page, view, source):
+    """Run the data computations of ``page`` (page_data.py and the pure helpers) without rendering."""
+    import page_data
+    from box_stats import box_stats
+    from scatter_sampling import density_sample, point_budget
+
+    if page == "Sales Trend":
+        page_data.sales_metrics(source, view["Price ($)"])
+        for time_dimension in ("Year", "Quarter", "Month"):
+            page_data.sales_over_time(source, time_dimension)
+        page_data.quarterly_comparison(source)
+        page_data.monthly_revenue(source)
+    elif page == "Customer":
+        page_data.customer_metrics(source, view["Customer Name"])
+        page_data.color_share(source)
+        page_data.brand_sales(source)
+        page_data.gender_body_style(source)
+        box_stats(view.to_frame(["Company", "Price ($)"]), "Company", "Price ($)")
+        density_sample(view["Annual Income"], view["Price ($)"], point_budget())
+    elif page == "Dealer":
+        page_data.dealer_metrics(source)
+        page_data.dealer_sales(source)
+        page_data.company_model_sales(source)
+        page_data.region_sales(source)
+        page_data.region_monthly_share(source)
+
+
+class Steps:
+    """Wall time and peak traced memory of named steps."""
+
+    def __init__(self, memory=True):
+        self.memory = memory
+        self.results = {}
+        if memory:
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def step(self, name):
+        if self.memory:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        yield
+        elapsed = (time.perf_counter() - start) * 1000
+        peak = tracemalloc.get_traced_memory()[1] - base if self.memory else None
+        self.results[name] = {
+            "ms": round(elapsed, 1),
+            "peak_mb": None if peak is None else round(peak / 2**20, 1),
+        }
+
+
+def run_pages(csv_path, steps, backend=None):
+    """Render every page for each filter state, recording one step per page and state."""
+    import data_loader
+    from dataset_view import DatasetView, enable_copy_on_write
+    from figure_cache import FigureCache, FigureScope
+    from Customer_hrrk import customer_page
+    from Dealer_zky import dealer_page
+    from Overview_tc import overview_page
+    from Sales_Trend_tc import sales_trend_page
+
+    enable_copy_on_write()
+    index = data_loader.load_filter_index(csv_path)
+    version = data_loader.dataset_version(csv_path)
+    states = {
+        "all": {"Year": [], "Dealer_Region": []},
+        "narrow": {"Year": index.values("Year")[-1:], "Dealer_Region": index.values("Dealer_Region")[:2]},
+    }
+    pages = {
+        "Overview": lambda view, cube, filters, figures: overview_page(
+            view, data_loader.load_data_profile(csv_path)),
+        "Sales Trend": lambda view, cube, filters, figures: sales_trend_page(view, cube, figures),
+        "Customer": lambda view, cube, filters, figures: customer_page(
+            view, cube, data_loader.load_price_box_stats(filters, csv_path), figures),
+        "Dealer": lambda view, cube, filters, figures: dealer_page(view, cube, figures),
+    }
+    for state, filters in states.items():
+        for page, render in pages.items():
+            df = data_loader.load_sales_data(csv_path, columns=FILTER_COLUMNS + PAGE_COLUMNS[page])
+            if page != "Overview":  # the overview only shows the precomputed profile
+                with steps.step(f"{page} data [{state}]"):
+                    page_computations(page, DatasetView(index.select(df, filters)),
+                                      data_loader.load_query_backend(csv_path, backend).where(filters))
+            with steps.step(f"{page} [{state}]"):
+                view = DatasetView(index.select(df, filters))
+                cube = data_loader.load_query_backend(csv_path, backend).where(filters)
+                figures = FigureScope(FigureCache(), version, page, filters,
+                                      executor=data_loader.load_chart_executor())
+                render(view, cube, filters, figures)
+
+
+def run_scale(n_rows, data_dir, seed=0, backend=None, memory=True, scale_cardinality=False):
+    """Steps of one scale, meant to run in a fresh interpreter (see ``measure``)."""
+    import data_loader
+    import synthetic_data
+    from cube import SalesCube
+
+    csv_path = synthetic_data.dataset_path(n_rows, data_dir, seed, scale_cardinality=scale_cardinality)
+
+    # bare mode: st.* calls render nothing and warn about the missing script context
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("streamlit"):
+            logging.getLogger(name).setLevel(logging.ERROR)
+
+    steps = Steps(memory)
+    with steps.step("snapshot build"):
+        data_loader.build_snapshot(csv_path)
+    with steps.step("snapshot load"):
+        data_loader.load_sales_data(csv_path)
+    with steps.step("query backend"):
+        source = data_loader.load_query_backend(csv_path, backend)
+    cube_cells = len(source) if isinstance(source, SalesCube) else None
+    if cube_cells is not None and n_rows >= CUBE_RATIO_ROWS:
+        assert cube_cells * CUBE_RATIO <= n_rows, f"{cube_cells} cube cells for {n_rows} rows"
+    with steps.step("filter index"):
+        data_loader.load_filter_index(csv_path)
+    with steps.step("data profile"):
+        data_loader.load_data_profile(csv_path)
+    # the two median paths of the Sales Trend metrics, see kpi.py
+    prices = data_loader.load_sales_data(csv_path, columns=["Price ($)"])["Price ($)"]
+    with steps.step("median exact"):
+        prices.median()
+    with steps.step("median sketch"):
+        source.kpis(median=True)
+    run_pages(csv_path, steps, backend)
+
+    # ru_maxrss is in kilobytes on Linux
+    max_rss_mb = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return {"steps": steps.results, "max_rss_mb": max_rss_mb, "cube_cells": cube_cells}
+
+
+def measure(n_rows, data_dir, seed=0, backend=None, memory=True, scale_cardinality=False):
+    """Run one scale in a fresh interpreter, so caches and memory peaks do not carry over."""
+    code = (
+        "import json, sys; sys.path.insert(0, 'benchmarks'); import page_scaling; "
+        f"print(json.dumps(page_scaling.run_scale({n_rows}, {data_dir!r}, {seed}, {backend!r}, {memory}, "
+        f"{scale_cardinality})))"
+    )
+    proc = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True)
+    if proc.returncode:
+        raise RuntimeError(f"{n_rows} rows failed:\n{proc.stderr}")
+    return json.loads(proc.stdout.splitlines()[-1])
+
+
+def print_report(report, baseline=None):
+    for rows, result in report.items():
+        cells = f", {result['cube_cells']:,} cube cells" if result.get("cube_cells") is not None else ""
+        print(f"\n{int(rows):,} rows (peak RSS {result['max_rss_mb']:,.0f} MB{cells})")
+        print(f"{'step':<26}{'ms':>10}{'peak MB':>10}" + (f"{'vs base':>10}" if baseline else ""))
+        for name, step in result["steps"].items():
+            line = f"{name:<26}{step['ms']:>10.1f}{step['peak_mb'] if step['peak_mb'] is not None else '-':>10}"
+            base = ((baseline or {}).get(rows) or {}).get("steps", {}).get(name)
+            if base and base["ms"]:
+                line += f"{step['ms'] / base['ms']:>9.2f}x"
+            print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=SCALES, help="scales to run (rows)")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="where the synthetic CSVs are kept")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic data")
+    parser.add_argument("--scale-cardinality", action="store_true",
+                        help="grow the dealers and customers with the number of rows (see synthetic_data.py)")
+    parser.add_argument("--backend", choices=["pandas", "duckdb"], help="query backend (default: SALES_QUERY_BACKEND)")
+    parser.add_argument("--no-memory", action="store_true", help="do not trace memory (plain timings)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--compare", help="JSON report of a previous run, shows the time ratio per step")
+    args = parser.parse_args(argv)
+
+    report = {
+        str(rows): measure(rows, args.data_dir, args.seed, args.backend, not args.no_memory, args.scale_cardinality)
+        for rows in args.rows
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+
+if __name__ == "__main__":
+    main()
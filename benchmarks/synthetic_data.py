@@ -0,0 +1,117 @@
+"""Schema-faithful synthetic car sales data for the benchmarks.
+
+Rows are bootstrapped from the shipped ``car sales.csv``, so the columns, the
+cardinalities of the text columns (28 dealers, 7 regions, 30 companies, 154
+models, ...) and their joint distribution (a model belongs to its company, a
+dealer to its region) are the real ones at any scale. Every generated row gets
+a new ``Car_id``, a date drawn uniformly over 2022-2023 written as dd/mm/YYYY
+(so, unlike the shipped file, every date parses), and a price and an income
+jittered by up to 10%.
+
+With ``--scale-cardinality`` the dealers and customers grow with the data
+instead: every copy of the source (one per ``len(source)`` generated rows)
+gets its own dealer and customer labels ("<name> #2", "#3", ...), so 1M rows
+have ~42 times the 28 dealers and ~3k customer names of the shipped file. A
+cloned dealer keeps the regions and dealer number of its original.
+
+Usage (from the repository root):
+
+    python benchmarks/synthetic_data.py 1000000 "car sales 1M.csv"
+    python benchmarks/synthetic_data.py 1000000 "car sales 1M.csv" --scale-cardinality
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_PATH = os.path.join(REPO_ROOT, "car sales.csv")
+
+DATE_RANGE = ("2022-01-01", "2023-12-31")
+JITTER = 0.10
+CHUNK_ROWS = 1_000_000
+
+# columns whose labels are cloned per copy of the source with --scale-cardinality
+SCALED_COLUMNS = ("Dealer_Name", "Customer Name")
+
+
+def _date_labels(start, end):
+    """dd/mm/YYYY label of every day of the range, generated rows index into it."""
+    return pd.date_range(start, end, freq="D").strftime("%d/%m/%Y").to_numpy(dtype=object)
+
+
+def copies_for(n_rows, source_rows):
+    """Number of copies of the source labels for ``n_rows`` rows with cardinality scaling (at least 1)."""
+    return max(1, -(-n_rows // source_rows))
+
+
+def _cloned_labels(values, copy):
+    """``values`` (a Series) of the clones ``copy`` (0 is the original), the others end with " #<copy + 1>"."""
+    clones = values + pd.Series(copy + 1, index=values.index).astype(str).radd(" #")
+    return values.where(copy == 0, clones).to_numpy()
+
+
+def generate(n_rows, source, seed=0, offset=0, copies=1):
+    """``n_rows`` synthetic rows bootstrapped from the ``source`` frame (raw CSV columns).
+
+    With ``copies`` > 1 every row draws one of ``copies`` clones of its dealer
+    and customer labels (see ``--scale-cardinality``).
+    """
+    rng = np.random.default_rng(seed)
+    rows = source.iloc[rng.integers(0, len(source), n_rows)].reset_index(drop=True)
+    labels = _date_labels(*DATE_RANGE)
+    ids = pd.Series(np.arange(offset + 1, offset + n_rows + 1)).astype(str).str.zfill(6)
+    jitter = lambda values: np.round(values * rng.uniform(1 - JITTER, 1 + JITTER, n_rows)).astype(np.int64)
+    scaled = {}
+    if copies > 1:
+        scaled = {column: _cloned_labels(rows[column], rng.integers(0, copies, n_rows))
+                  for column in SCALED_COLUMNS}
+    return rows.assign(**{
+        "Car_id": ("C_CND_" + ids).to_numpy(),
+        "Date": labels[rng.integers(0, len(labels), n_rows)],
+        "Price ($)": jitter(rows["Price ($)"].to_numpy()),
+        "Annual Income": jitter(rows["Annual Income"].to_numpy()),
+        **scaled,
+    })
+
+
+def write_csv(n_rows, path, seed=0, source_path=SOURCE_PATH, chunk_rows=CHUNK_ROWS, scale_cardinality=False):
+    """Write ``n_rows`` synthetic rows to ``path`` in chunks, so memory stays bounded at any scale."""
+    source = pd.read_csv(source_path, dtype=str).astype({"Price ($)": "int64", "Annual Income": "int64"})
+    # sized on the whole file, every chunk draws from the same clones
+    copies = copies_for(n_rows, len(source)) if scale_cardinality else 1
+    tmp_path = f"{path}.tmp"
+    for chunk, start in enumerate(range(0, n_rows, chunk_rows)):
+        rows = generate(min(chunk_rows, n_rows - start), source, seed=(seed, chunk), offset=start, copies=copies)
+        rows.to_csv(tmp_path, mode="w" if start == 0 else "a", header=start == 0, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def dataset_path(n_rows, data_dir, seed=0, source_path=SOURCE_PATH, scale_cardinality=False):
+    """Path of the synthetic CSV with ``n_rows`` rows in ``data_dir``, generated on first use."""
+    scaled = " scaled" if scale_cardinality else ""
+    path = os.path.join(data_dir, f"car sales {n_rows} seed{seed}{scaled}.csv")
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(source_path):
+        os.makedirs(data_dir, exist_ok=True)
+        write_csv(n_rows, path, seed=seed, source_path=source_path, scale_cardinality=scale_cardinality)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("rows", type=int, help="number of rows to generate")
+    parser.add_argument("output", help="CSV file to write")
+    parser.add_argument("--seed", type=int, default=0, help="random seed, same seed gives the same file")
+    parser.add_argument("--scale-cardinality", action="store_true",
+                        help="grow the dealers and customers with the number of rows")
+    args = parser.parse_args(argv)
+
+    write_csv(args.rows, args.output, seed=args.seed, scale_cardinality=args.scale_cardinality)
+    print(f"{args.output}: {args.rows} rows")
+
+
+if __name__ == "__main__":
+    main()
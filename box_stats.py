@@ -0,0 +1,66 @@
+"""Box-plot statistics computed on the server.
+
+``px.box`` ships every value to the browser and lets Plotly compute the
+quartiles in JavaScript. ``box_stats`` computes the same summary per group
+(quartiles, Tukey whiskers and a capped sample of the outliers) with one sort of
+the values, so the chart payload grows with the number of groups instead of the
+number of rows.
+"""
+import numpy as np
+import pandas as pd
+
+
+WHISKER_FACTOR = 1.5
+MAX_OUTLIERS = 50  # per group
+
+
+def box_stats(df, by, value, factor=WHISKER_FACTOR, max_outliers=MAX_OUTLIERS):
+    """Return (stats, outliers) of ``value`` per ``by`` group.
+
+    ``stats`` is indexed by the sorted group values with the columns count, q1,
+    median, q3, lowerfence and upperfence (quartiles interpolate linearly like
+    numpy's default, whiskers reach the most extreme values within ``factor``
+    IQRs of the quartiles). ``outliers`` holds the ``by`` and ``value`` columns of
+    at most ``max_outliers`` outliers per group, evenly spaced over their sorted values.
+    """
+    data = df[[by, value]].dropna()
+    codes, groups = pd.factorize(data[by], sort=True)
+    values = data[value].to_numpy(dtype=float)
+
+    # sort by group, then value, so every group is a sorted contiguous slice
+    order = np.lexsort((values, codes))
+    codes, values = codes[order], values[order]
+    starts = np.searchsorted(codes, np.arange(len(groups)))
+    counts = np.bincount(codes, minlength=len(groups))
+
+    def quantile(q):
+        position = starts + q * (counts - 1)
+        lo = np.floor(position).astype(np.int64)
+        hi = np.minimum(lo + 1, starts + counts - 1)
+        return values[lo] + (position - lo) * (values[hi] - values[lo])
+
+    q1, median, q3 = quantile(0.25), quantile(0.5), quantile(0.75)
+    lower, upper = q1 - factor * (q3 - q1), q3 + factor * (q3 - q1)
+
+    # the slices are sorted, so the whiskers sit right after the low and before the high outliers
+    below = values < lower[codes]
+    above = values > upper[codes]
+    lowerfence = values[starts + np.bincount(codes, weights=below, minlength=len(groups)).astype(np.int64)]
+    upperfence = values[starts + counts - 1 - np.bincount(codes, weights=above, minlength=len(groups)).astype(np.int64)]
+
+    stats = pd.DataFrame(
+        {"count": counts, "q1": q1, "median": median, "q3": q3,
+         "lowerfence": lowerfence, "upperfence": upperfence},
+        index=pd.Index(groups, name=by),
+    )
+
+    # keep evenly spaced outliers of every group, rank i is kept when i * cap / n reaches a new integer
+    outlier_pos = np.flatnonzero(below | above)
+    outlier_codes = codes[outlier_pos]
+    n = np.bincount(outlier_codes, minlength=len(groups))[outlier_codes]
+    rank = np.arange(len(outlier_pos)) - np.searchsorted(outlier_codes, outlier_codes)
+    cap = np.minimum(n, max_outliers)
+    keep = (rank == 0) | (np.floor(rank * cap / n) != np.floor((rank - 1) * cap / n))
+    kept = outlier_pos[keep]
+    outliers = pd.DataFrame({by: groups[codes[kept]], value: values[kept]})
+    return stats, outliers
@@ -0,0 +1,121 @@
+"""Period-over-period comparisons (YoY, QoQ, MoM) of the sales measures.
+
+``period_matrix`` rolls the query source up by period, optionally per group of
+dimensions (Dealer_Region, Company, Dealer_Name, ...), and lays the measure out
+as a groups x consecutive periods matrix. ``period_over_period`` compares every
+period with the one ``lag`` periods before in one vectorized step:
+
+- lag 1 is QoQ on quarters, MoM on months, YoY on years,
+- lag 4 on quarters (12 on months) compares with the same period a year before,
+- ``window`` compares trailing sums, e.g. window 3, lag 3 on months compares
+  the last three months with the three before, window 12, lag 12 is the
+  trailing twelve months year over year.
+
+Only the rollup (one row per group and period) is read, never the rows.
+Periods are numbered consecutively across years, so a lag crosses year ends;
+periods without sales count as 0, the growth from 0 is NaN.
+"""
+import numpy as np
+import pandas as pd
+
+from time_dimension import period_labels
+
+
+PERIODS_PER_YEAR = {"Year": 1, "Quarter": 4, "Month": 12}
+
+# measure name -> rollup column
+MEASURES = {"revenue": "price_sum", "volume": "count"}
+
+
+def _time_columns(granularity):
+    if granularity not in PERIODS_PER_YEAR:
+        raise ValueError(f"Unknown granularity {granularity!r}, expected one of {list(PERIODS_PER_YEAR)}")
+    return ["Year"] if granularity == "Year" else ["Year", granularity]
+
+
+def period_numbers(frame, granularity):
+    """Consecutive period numbers (year * periods per year + period - 1) of the rows of ``frame``."""
+    number = frame["Year"].to_numpy(dtype=np.int64) * PERIODS_PER_YEAR[granularity]
+    if granularity != "Year":
+        number += frame[granularity].to_numpy(dtype=np.int64) - 1
+    return number
+
+
+def period_fields(numbers, granularity):
+    """Year (and Quarter or Month) columns of period numbers."""
+    year, period = np.divmod(np.asarray(numbers, dtype=np.int64), PERIODS_PER_YEAR[granularity])
+    fields = pd.DataFrame({"Year": year})
+    if granularity != "Year":
+        fields[granularity] = period + 1
+    return fields
+
+
+def period_matrix(source, granularity="Quarter", measure="revenue", by=()):
+    """(matrix, groups, periods) of the ``measure`` per group and period.
+
+    ``matrix`` has one row per group of the ``by`` columns (one row if there
+    are none) and one column per period number of ``periods``, every period
+    between the first and the last one with sales. ``groups`` is a frame of the
+    ``by`` values of the rows.
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    rollup = source.rollup(by + _time_columns(granularity))
+    numbers = period_numbers(rollup, granularity)
+    if by:
+        codes, groups = pd.MultiIndex.from_frame(rollup[by]).factorize(sort=True)
+        groups = groups.set_names(by).to_frame(index=False)
+    else:
+        codes, groups = np.zeros(len(rollup), dtype=np.intp), pd.DataFrame(index=range(1))
+    if not len(rollup):
+        return np.zeros((len(groups), 0)), groups, np.array([], dtype=np.int64)
+
+    periods = np.arange(numbers.min(), numbers.max() + 1)
+    matrix = np.zeros((len(groups), len(periods)))
+    # one rollup row per group and period
+    matrix[codes, numbers - periods[0]] = rollup[MEASURES[measure]].to_numpy(dtype=float)
+    return matrix, groups, periods
+
+
+def period_over_period(source, granularity="Quarter", measure="revenue", by=(), lag=1, window=1):
+    """Growth of the ``measure`` of every period over the period ``lag`` periods before.
+
+    Returns the ``by`` columns, Year (and Quarter or Month), Period (label),
+    Value, Previous and 'Growth (%)', one row per group and period that has a
+    comparison period, in group and period order.
+    """
+    if lag < 1 or window < 1:
+        raise ValueError(f"lag and window must be positive, got lag={lag!r}, window={window!r}")
+    matrix, groups, periods = period_matrix(source, granularity, measure, by)
+
+    # trailing sums over ``window`` periods, defined from the window-th period on
+    cumulative = np.cumsum(matrix, axis=1)
+    values = cumulative[:, window - 1:].copy()
+    values[:, 1:] -= cumulative[:, :-window]
+    previous, values = values[:, :-lag], values[:, lag:]
+    growth = np.divide(values - previous, previous, out=np.full(values.shape, np.nan), where=previous != 0) * 100
+
+    n_groups, n_periods = values.shape
+    result = pd.concat([
+        groups.loc[groups.index.repeat(n_periods)].reset_index(drop=True),
+        period_fields(np.tile(periods[window - 1 + lag:], n_groups), granularity),
+    ], axis=1)
+    labels = period_labels(result, granularity) if len(result) else []
+    return result.assign(Period=labels, Value=values.ravel(), Previous=previous.ravel(), **{"Growth (%)": growth.ravel()})
+
+
+def _period_number(period, granularity):
+    year, *rest = np.atleast_1d(period)
+    return int(year) * PERIODS_PER_YEAR[granularity] + (int(rest[0]) - 1 if rest else 0)
+
+
+def compare_periods(source, granularity, first, second, measure="revenue", by=()):
+    """Growth from period ``first`` to the later period ``second`` per group (same columns as ``period_over_period``).
+
+    Periods are (year, quarter or month) pairs, or years for the Year
+    granularity, e.g. ``compare_periods(cube, "Month", (2022, 3), (2023, 3), by="Company")``.
+    """
+    first, second = _period_number(first, granularity), _period_number(second, granularity)
+    if second <= first:
+        raise ValueError(f"the second period must come after the first one, got {first} and {second}")
+    growth = period_over_period(source, granularity, measure, by, lag=second - first)
+    return growth[period_numbers(growth, granularity) == second].reset_index(drop=True)
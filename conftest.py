@@ -0,0 +1,5 @@
+"""pytest configuration: the tests import the modules from the repository root and run Streamlit in bare mode."""
+import logging
+
+# cached loaders called outside a Streamlit script warn on every call
+logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").setLevel(logging.ERROR)
@@ -0,0 +1,491 @@
+"""Data access layer for the car sales dataset.
+
+The CSV is converted once into a Parquet snapshot (compact dtypes from
+schema.py, dictionary encoded text columns, real datetime ``Date``) which is
+rebuilt whenever the CSV changes: the snapshot records the mtime and size of
+the CSV it was built from, so a CSV replaced by an older file (a restored
+backup, ``cp -p``, a checkout) is picked up too. Workers memory-map an Arrow copy of the
+snapshot written next to it (see shared_snapshot.py), so the host keeps one
+copy of the data whatever the number of processes. Pages load it with column
+projection, and every projection is shared by all sessions of the process
+through ``st.cache_resource``. The cache key is the snapshot signature
+(path, mtime, size) plus the batches appended since (see ingest.py), so
+replacing or appending data creates a new version without restarting the app.
+An append only processes the new rows for the cube and the filter index, the
+frames are concatenated copies. New versions are built by a
+background thread and published once ready (see refresh.py). The published
+handle keeps the structures of its version referenced, so a rerun pinned to it
+gets them whatever the caches evict, and a version that is not the current one
+on disk is only ever read from its own files (its Arrow copy and Parquet link,
+its appended parts), never rebuilt from the current ones. Each process leases
+the snapshot versions it has published, their files are removed once no worker
+of the host leases them any more (see shared_snapshot.py).
+
+Run ``python data_loader.py`` to (re)build the snapshot ahead of deployment.
+"""
+import functools
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+
+from box_stats import box_stats
+from cube import CUBE_COLUMNS, SalesCube
+from data_profile import build_profile, profile_from_json, profile_to_json
+from figure_cache import FigureCache, chart_workers
+from instrumentation import LatencyStats
+from filter_index import INDEX_COLUMNS, BitmapIndex, filter_key
+from query_backend import DuckDBSource, backend_name
+from refresh import DatasetRefresher, refresh_interval
+from schema import concat_frames, memory_report, optimize_dtypes
+from shared_snapshot import (VersionLease, link_parquet_snapshot, parquet_snapshot, read_arrow_snapshot,
+                             remove_unused_versions, snapshot_lock, write_arrow_snapshot)
+from time_dimension import DATE_FORMAT, MISSING_DAY, parse_dates, time_columns, to_datetime
+
+
+DATA_PATH = "car sales.csv"
+
+# explicit dtypes so pandas does not have to infer them on every load
+CSV_DTYPES = {
+    "Car_id": str,
+    "Date": str,
+    "Customer Name": str,
+    "Gender": str,
+    "Annual Income": "int64",
+    "Dealer_Name": str,
+    "Company": str,
+    "Model": str,
+    "Engine": str,
+    "Transmission": str,
+    "Color": str,
+    "Price ($)": "int64",
+    "Dealer_No ": str,
+    "Body Style": str,
+    "Phone": "int64",
+    "Dealer_Region": str,
+}
+
+
+def file_signature(path=DATA_PATH):
+    """Return the (path, mtime, size) tuple used as the cache key."""
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+
+def prepare_sales_data(df, date_format=DATE_FORMAT):
+    """Parse dates and derive the Year/Quarter/Month columns used by the pages.
+
+    Dates are parsed once into day ordinals, the calendar columns are derived
+    from them with integer arithmetic (see time_dimension.py).
+    """
+    days = parse_dates(df['Date'], date_format)
+    parsed = days != MISSING_DAY
+    days = days[parsed]
+    calendar = time_columns(days)
+    return df[parsed].assign(
+        Date=to_datetime(days),
+        Year=calendar['Year'],
+        Quarter=calendar['Quarter'],
+        Month=calendar['Month'],
+    )
+
+
+def read_csv_data(path=DATA_PATH):
+    """Parse the raw CSV into the prepared, compact frame (no caching)."""
+    df = pd.read_csv(path, dtype=CSV_DTYPES)
+    return optimize_dtypes(prepare_sales_data(df))
+
+
+############### parquet snapshot ###############
+
+def snapshot_path_for(csv_path=DATA_PATH):
+    return os.path.splitext(csv_path)[0] + ".parquet"
+
+
+# schema metadata of the snapshot: "mtime_ns-size" of the CSV it was built from
+# and the profile of that CSV (see data_profile.py)
+SOURCE_METADATA_KEY = b"sales_dashboard.source"
+PROFILE_METADATA_KEY = b"sales_dashboard.profile"
+
+
+def csv_stamp(csv_path=DATA_PATH):
+    """"mtime_ns-size" of the CSV, recorded in the snapshot built from it."""
+    stat = os.stat(csv_path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}".encode()
+
+
+@functools.lru_cache(maxsize=8)
+def _snapshot_metadata(path, mtime_ns, size):
+    # only the footer is read, once per snapshot version
+    return pq.read_schema(path).metadata or {}
+
+
+def snapshot_is_stale(csv_path=DATA_PATH, snapshot_path=None):
+    """True when the snapshot is missing or was not built (with its profile) from the current CSV."""
+    snapshot_path = snapshot_path or snapshot_path_for(csv_path)
+    if not os.path.exists(snapshot_path):
+        return True
+    metadata = _snapshot_metadata(*file_signature(snapshot_path))
+    return PROFILE_METADATA_KEY not in metadata or metadata.get(SOURCE_METADATA_KEY) != csv_stamp(csv_path)
+
+
+def build_snapshot(csv_path=DATA_PATH, snapshot_path=None):
+    """Convert the CSV into a Parquet snapshot (with the profile of the CSV) and return its path."""
+    snapshot_path = snapshot_path or snapshot_path_for(csv_path)
+    # stamped before reading: a CSV replaced meanwhile leaves the snapshot stale
+    stamp = csv_stamp(csv_path)
+    raw = pd.read_csv(csv_path, dtype=CSV_DTYPES)
+    table = pa.Table.from_pandas(optimize_dtypes(prepare_sales_data(raw)), preserve_index=False)
+    table = table.replace_schema_metadata({
+        **table.schema.metadata,
+        SOURCE_METADATA_KEY: stamp,
+        PROFILE_METADATA_KEY: profile_to_json(build_profile(raw)).encode(),
+    })
+
+    # write to a temporary file first so readers never see a half written snapshot
+    tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, snapshot_path)
+
+    # the memory-mapped copy the workers load and the Parquet link DuckDB reads (see shared_snapshot.py)
+    write_arrow_snapshot(snapshot_path)
+    link_parquet_snapshot(snapshot_path)
+    return snapshot_path
+
+
+def ensure_snapshot(csv_path=DATA_PATH):
+    """Return the snapshot path, rebuilding the snapshot if the CSV changed.
+
+    Checked and built under the snapshot lock, the workers of the host never build it twice.
+    """
+    snapshot_path = snapshot_path_for(csv_path)
+    with snapshot_lock(snapshot_path):
+        if snapshot_is_stale(csv_path, snapshot_path):
+            build_snapshot(csv_path, snapshot_path)
+            drop_stale_appends(csv_path)
+    return snapshot_path
+
+
+############### appended batches ###############
+
+# batches appended after the snapshot was built (see ingest.py) are stored as
+# numbered Parquet parts next to it, with the same columns and dtypes
+
+def appends_dir_for(csv_path=DATA_PATH):
+    return os.path.splitext(csv_path)[0] + ".appends"
+
+
+def append_parts(csv_path=DATA_PATH):
+    """Paths of the appended parts in append order."""
+    directory = appends_dir_for(csv_path)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".parquet"))
+
+
+def write_append_part(df, csv_path=DATA_PATH):
+    """Store a prepared batch as the next appended part and return its path."""
+    directory = appends_dir_for(csv_path)
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f"batch.{os.getpid()}.{threading.get_ident()}.tmp")
+    df.to_parquet(tmp_path, engine="pyarrow", index=False)
+    try:
+        # os.link fails if the name is taken, so concurrent writers never overwrite each other
+        number = len(append_parts(csv_path)) + 1
+        while True:
+            path = os.path.join(directory, f"{number:06d}.parquet")
+            try:
+                os.link(tmp_path, path)
+                return path
+            except FileExistsError:
+                number += 1
+    finally:
+        os.remove(tmp_path)
+
+
+def drop_stale_appends(csv_path=DATA_PATH):
+    """Remove the parts older than the CSV, a new full export already contains them."""
+    csv_mtime = os.stat(csv_path).st_mtime_ns
+    for part in append_parts(csv_path):
+        if os.stat(part).st_mtime_ns <= csv_mtime:
+            os.remove(part)
+
+
+def dataset_version(path=DATA_PATH):
+    """(snapshot path, mtime, size, appended part names), the key of every cached structure.
+
+    Replacing the CSV changes the snapshot signature, appending a batch adds a part.
+    The snapshot is rebuilt first if the CSV changed, the app leaves this to the
+    refresher thread (see ``load_dataset_refresher``) and uses the version it published.
+    """
+    snapshot_path = ensure_snapshot(path)
+    parts = tuple(os.path.basename(part) for part in append_parts(path))
+    return (*file_signature(snapshot_path), parts)
+
+
+def _read_part(snapshot_path, part, columns):
+    return pd.read_parquet(os.path.join(appends_dir_for(snapshot_path), part), engine="pyarrow",
+                           columns=list(columns) if columns else None)
+
+
+############### cached loading ###############
+
+# every structure of version (..., parts) extends the cached one of (..., parts[:-1])
+# with the last part: the cube and the filter index only process the batch, a frame
+# is concatenated, which copies all of its rows (an append costs O(rows) per projection)
+
+# one entry per column projection (page projections, cube and index columns) of two versions,
+# the published one and the one being built, entries of a replaced snapshot age out of the LRU
+@st.cache_resource(max_entries=16, show_spinner="Loading car sales data...")
+def _load_snapshot(path, mtime_ns, size, parts, columns):
+    if parts:
+        frame = concat_frames([_load_snapshot(path, mtime_ns, size, parts[:-1], columns),
+                               _read_part(path, parts[-1], columns)])
+        # the frame of the previous parts is superseded, do not keep a second full copy of it
+        # (a rerun still on that version gets it from its handle, see DatasetResources)
+        _load_snapshot.clear(path, mtime_ns, size, parts[:-1], columns)
+        return frame
+    return read_arrow_snapshot(path, mtime_ns, size, columns)
+
+
+def projection(columns):
+    """Normalized column projection (cache key), None for all columns."""
+    return tuple(dict.fromkeys(columns)) if columns else None
+
+
+def load_sales_data(path=DATA_PATH, columns=None, version=None):
+    """Return the prepared sales frame, shared across sessions.
+
+    ``columns`` restricts the load to the listed columns (all columns if None).
+    ``version`` (a published ``dataset_version``) defaults to the current files.
+    The returned frame is cached and shared, callers must not modify it in place.
+    """
+    version = version or dataset_version(path)
+    columns = projection(columns)
+    return _pinned_load(version, ("frame", columns), lambda: _load_snapshot(*version, columns))
+
+
+@st.cache_resource(max_entries=2, show_spinner="Building sales cube...")
+def _build_cube(path, mtime_ns, size, parts):
+    if parts:
+        delta = SalesCube.from_frame(_read_part(path, parts[-1], CUBE_COLUMNS))
+        return _build_cube(path, mtime_ns, size, parts[:-1]).merge(delta)
+    return SalesCube.from_frame(_load_snapshot(path, mtime_ns, size, parts, tuple(CUBE_COLUMNS)))
+
+
+def load_sales_cube(path=DATA_PATH, version=None):
+    """Return the aggregate cube of the data, shared across sessions."""
+    version = version or dataset_version(path)
+    return _pinned_load(version, "cube", lambda: _build_cube(*version))
+
+
+# DuckDB reads the Parquet link of the version, not the snapshot path a new version replaces
+@st.cache_resource(max_entries=2)
+def _duckdb_source(path, mtime_ns, size, parts):
+    return DuckDBSource([parquet_snapshot(path, mtime_ns, size)] + [os.path.join(appends_dir_for(path), part) for part in parts])
+
+
+def load_query_backend(path=DATA_PATH, backend=None, version=None):
+    """Return the aggregation source used by the pages.
+
+    ``backend`` is "pandas" (the sales cube) or "duckdb" (SQL over the snapshot),
+    by default it is read from the SALES_QUERY_BACKEND environment variable.
+    """
+    backend = backend or backend_name()
+    version = version or dataset_version(path)
+    if backend == "duckdb":
+        return _pinned_load(version, "duckdb", lambda: _duckdb_source(*version))
+    return load_sales_cube(path, version)
+
+
+# the profile describes the raw file (including rows whose date does not parse),
+# so it is keyed on the CSV signature rather than the snapshot, it is read from
+# the metadata of the snapshot built from that CSV
+# (two entries, reruns pinned to the previous version keep theirs during a refresh)
+@st.cache_resource(max_entries=2, show_spinner="Loading the car sales profile...")
+def _build_profile(path, mtime_ns, size):
+    snapshot_path = ensure_snapshot(path)
+    metadata = _snapshot_metadata(*file_signature(snapshot_path))
+    if metadata.get(SOURCE_METADATA_KEY) != f"{mtime_ns}-{size}".encode():
+        raise FileNotFoundError(f"Version {(path, mtime_ns, size)} of the CSV is no longer available, it was replaced")
+    return profile_from_json(metadata[PROFILE_METADATA_KEY])
+
+
+def load_data_profile(path=DATA_PATH, signature=None):
+    """Return the data-quality profile of the raw CSV, shared across sessions.
+
+    ``signature`` is the ``file_signature`` of the CSV version to profile, the current file by default.
+    """
+    signature = signature or file_signature(path)
+    return _pinned_load(signature, "profile", lambda: _build_profile(*signature))
+
+
+@st.cache_resource(max_entries=2, show_spinner="Building filter index...")
+def _build_filter_index(path, mtime_ns, size, parts):
+    if parts:
+        delta = _read_part(path, parts[-1], INDEX_COLUMNS)
+        return _build_filter_index(path, mtime_ns, size, parts[:-1]).append(delta)
+    return BitmapIndex(_load_snapshot(path, mtime_ns, size, parts, tuple(INDEX_COLUMNS)))
+
+
+def load_filter_index(path=DATA_PATH, version=None):
+    """Return the bitmap filter index of the data, shared across sessions."""
+    version = version or dataset_version(path)
+    return _pinned_load(version, "filter_index", lambda: _build_filter_index(*version))
+
+
+# one entry per sidebar filter state, each entry only holds a few rows per brand
+@st.cache_resource(max_entries=64, show_spinner=False)
+def _build_price_box_stats(path, mtime_ns, size, parts, filters):
+    version = (path, mtime_ns, size, parts)
+    rows = load_filter_index(path, version).select(load_sales_data(path, CUBE_COLUMNS, version), dict(filters))
+    return box_stats(rows, "Company", "Price ($)")
+
+
+def load_price_box_stats(filters, path=DATA_PATH, version=None):
+    """Return (stats, outliers) of the price per Company for the sidebar ``filters``.
+
+    See box_stats.py, the result is cached per filter state and shared across sessions.
+    """
+    return _build_price_box_stats(*(version or dataset_version(path)), filter_key(filters))
+
+
+############### background refresh ###############
+
+class DatasetResources(dict):
+    """Shared structures built for one version, loader key -> structure.
+
+    The published handle of the version holds them (see refresh.PublishedVersion),
+    so the reruns pinned to it keep getting them after the caches evicted them.
+    """
+
+
+# resources of the versions (and CSV signatures) whose handle is alive
+_pinned = weakref.WeakValueDictionary()
+_pinned_lock = threading.Lock()
+
+# snapshot (path, mtime, size) -> [lease, number of warmed versions of it not released yet]
+_leases = {}
+_leases_lock = threading.Lock()
+
+
+def _lease_snapshot(version):
+    with _leases_lock:
+        entry = _leases.get(version[:3])
+        if entry is None:
+            entry = _leases[version[:3]] = [VersionLease(*version[:3]), 0]
+        entry[1] += 1
+
+
+def _release_snapshot(version):
+    with _leases_lock:
+        entry = _leases.get(version[:3])
+        if entry is not None:
+            entry[1] -= 1
+            if not entry[1]:
+                entry[0].close()
+                del _leases[version[:3]]
+
+
+def _pinned_load(version, key, load):
+    """Structure ``key`` of the pinned ``version`` if it has one, else ``load()`` (kept if the version is pinned)."""
+    resources = _pinned.get(version)
+    if resources is None:
+        return load()
+    if key not in resources:
+        resources.setdefault(key, load())
+    return resources[key]
+
+
+def source_signature(path=DATA_PATH):
+    """(CSV signature, appended part names), checked by the refresher, only stats the files."""
+    return file_signature(path), tuple(os.path.basename(part) for part in append_parts(path))
+
+
+def warm_dataset(path=DATA_PATH, projections=()):
+    """Build the snapshot and every shared structure of the current data.
+
+    ``projections`` are the column projections the pages load (None for all
+    columns). Returns (version, resources), the loaders serve the version from
+    ``resources`` for as long as it is referenced.
+    """
+    version = dataset_version(path)
+    signature = file_signature(path)
+    with _pinned_lock:
+        # a version built again (e.g. a touched file) shares the resources of its live handle
+        resources = _pinned.get(version)
+        leased = resources is None
+        if leased:
+            # the files of the snapshot stay until ``release_dataset``, whatever the other workers do
+            resources = DatasetResources()
+            _lease_snapshot(version)
+        _pinned[version] = _pinned[signature] = resources
+    try:
+        for columns in projections:
+            load_sales_data(path, columns, version)
+        load_filter_index(path, version)
+        load_query_backend(path, version=version)
+        load_data_profile(path, signature)
+    except Exception:
+        if leased:
+            _release_snapshot(version)
+        raise
+    return version, resources
+
+
+def release_dataset(version, projections=()):
+    """Drop the shared structures of ``version`` from the caches (see ``warm_dataset``)."""
+    for columns in set(projections) | {tuple(CUBE_COLUMNS), tuple(INDEX_COLUMNS)}:
+        _load_snapshot.clear(*version, columns)
+    _build_cube.clear(*version)
+    _duckdb_source.clear(*version)
+    _build_filter_index.clear(*version)
+    # the Arrow copy and the Parquet link are shared by all the appended versions of a snapshot,
+    # they go once the snapshot is replaced and no version of it is leased on the host
+    _release_snapshot(version)
+    remove_unused_versions(version[0])
+
+
+@st.cache_resource
+def load_dataset_refresher(projections=(), path=DATA_PATH):
+    """Return the refresher publishing the versions of the data (see refresh.py), one per process.
+
+    ``projections`` are the column lists the pages load, they are built with every new version.
+    """
+    projections = tuple(projection(columns) for columns in projections)
+    return DatasetRefresher(
+        signature=lambda: source_signature(path),
+        build=lambda: warm_dataset(path, projections),
+        release=lambda version: release_dataset(version, projections),
+        interval=refresh_interval(),
+    ).start()
+
+
+@st.cache_resource
+def load_figure_cache():
+    """Return the chart cache shared by all sessions, see figure_cache.py."""
+    return FigureCache()
+
+
+@st.cache_resource
+def load_chart_executor():
+    """Return the thread pool building charts for all sessions (None if SALES_CHART_WORKERS is 1)."""
+    workers = chart_workers()
+    return ThreadPoolExecutor(workers, thread_name_prefix="chart") if workers > 1 else None
+
+
+@st.cache_resource
+def load_latency_stats():
+    """Return the rolling rerun latencies shared by all sessions, see instrumentation.py."""
+    return LatencyStats()
+
+
+if __name__ == "__main__":
+    raw = prepare_sales_data(pd.read_csv(DATA_PATH, dtype=CSV_DTYPES))
+    print(memory_report(raw, optimize_dtypes(raw)).to_string())
+    print(f"Snapshot written to {build_snapshot()}")
@@ -0,0 +1,116 @@
+"""Data-quality profile rendered by the Overview page.
+
+The profile is computed once per version of the raw CSV (the Overview shows
+the raw file, including rows whose dates do not parse), while the snapshot is
+built from the same parse, and stored as JSON in the snapshot metadata
+(``profile_to_json``). Workers load it from there, so the page only renders
+precomputed numbers and no worker re-reads or scans the file.
+"""
+import json
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from histograms import histogram, kde_curve
+
+
+NUMERIC_COLUMNS = ['Annual Income', 'Price ($)']
+
+# Tukey fences, values outside [Q1 - k*IQR, Q3 + k*IQR] count as outliers
+IQR_FACTOR = 1.5
+
+
+@dataclass(frozen=True)
+class DataProfile:
+    n_rows: int
+    sample: pd.DataFrame          # first rows of the raw file
+    missing: pd.Series            # missing values per column
+    gender_counts: pd.Series      # value counts of 'Gender'
+    histograms: dict              # column -> (counts, bin_edges)
+    densities: dict               # column -> (grid, density) of the Gaussian KDE
+    outlier_bounds: pd.DataFrame  # per numeric column: lower, upper, outliers
+
+
+def missing_counts(df):
+    """Missing values per column, empty or whitespace-only text counts as missing."""
+    missing = df.isna().sum()
+    for col in df.select_dtypes(include="object").columns:
+        missing[col] += df[col].str.strip().eq('').sum()
+    return missing
+
+
+def outlier_bounds(values, factor=IQR_FACTOR):
+    q1, q3 = np.nanpercentile(values, [25, 75])
+    lower, upper = q1 - factor * (q3 - q1), q3 + factor * (q3 - q1)
+    return lower, upper, int(((values < lower) | (values > upper)).sum())
+
+
+def build_profile(df, sample_rows=3):
+    """Compute the profile of the raw sales frame in a single pass per column."""
+    histograms = {}
+    densities = {}
+    bounds = {}
+    for col in NUMERIC_COLUMNS:
+        values = df[col].dropna().to_numpy()
+        histograms[col] = histogram(values)
+        densities[col] = kde_curve(values)
+        bounds[col] = outlier_bounds(values)
+
+    return DataProfile(
+        n_rows=len(df),
+        sample=df.head(sample_rows),
+        missing=missing_counts(df),
+        gender_counts=df['Gender'].value_counts(),
+        histograms=histograms,
+        densities=densities,
+        outlier_bounds=pd.DataFrame.from_dict(bounds, orient="index", columns=["lower", "upper", "outliers"]),
+    )
+
+
+def _frame_to_dict(frame):
+    dtypes = frame.dtypes.astype(str).tolist()
+    return {**frame.to_dict(orient="split"), "dtypes": dtypes, "index_name": frame.index.name}
+
+
+def _frame_from_dict(value):
+    frame = pd.DataFrame(value["data"], index=value["index"], columns=value["columns"])
+    return frame.astype(dict(zip(value["columns"], value["dtypes"]))).rename_axis(value["index_name"])
+
+
+def _series_to_dict(series):
+    return {"name": series.name, "index": series.index.tolist(), "index_name": series.index.name,
+            "data": series.tolist(), "dtype": str(series.dtype)}
+
+
+def _series_from_dict(value):
+    index = pd.Index(value["index"], name=value["index_name"])
+    return pd.Series(value["data"], index=index, name=value["name"], dtype=value["dtype"])
+
+
+def profile_to_json(profile):
+    """The profile as JSON text, ``profile_from_json`` gives it back with the same dtypes."""
+    return json.dumps({
+        "n_rows": profile.n_rows,
+        "sample": _frame_to_dict(profile.sample),
+        "missing": _series_to_dict(profile.missing),
+        "gender_counts": _series_to_dict(profile.gender_counts),
+        "histograms": {col: [part.tolist() for part in parts] for col, parts in profile.histograms.items()},
+        "densities": {col: [part.tolist() for part in parts] for col, parts in profile.densities.items()},
+        "outlier_bounds": _frame_to_dict(profile.outlier_bounds),
+    })
+
+
+def profile_from_json(text):
+    """Profile stored with ``profile_to_json``."""
+    value = json.loads(text)
+    return DataProfile(
+        n_rows=value["n_rows"],
+        sample=_frame_from_dict(value["sample"]),
+        missing=_series_from_dict(value["missing"]),
+        gender_counts=_series_from_dict(value["gender_counts"]),
+        histograms={col: tuple(map(np.asarray, parts)) for col, parts in value["histograms"].items()},
+        densities={col: tuple(np.asarray(part, dtype=float) for part in parts)
+                   for col, parts in value["densities"].items()},
+        outlier_bounds=_frame_from_dict(value["outlier_bounds"]),
+    )
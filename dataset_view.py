@@ -0,0 +1,89 @@
+"""Read-only view of the sidebar selection handed to the pages.
+
+The frames returned by data_loader are cached and shared by every session, so
+pages must never modify them. A ``DatasetView`` only exposes reads: columns,
+row selections and plain copies for plotting. With pandas Copy-on-Write
+(``enable_copy_on_write``, switched on by app.py) the returned columns and frames share memory
+with the cached frame until someone writes to them, and only then is the
+written column copied, so the read path never copies the filtered frame.
+
+``write_guard`` checks that a block of code left a frame untouched. It hashes
+every column, so it is meant for tests and debugging: app.py runs the pages
+under it when the ``SALES_WRITE_GUARD`` environment variable is set.
+"""
+import contextlib
+import os
+
+import pandas as pd
+
+
+WRITE_GUARD_ENV_VAR = "SALES_WRITE_GUARD"
+
+
+def enable_copy_on_write():
+    pd.set_option("mode.copy_on_write", True)
+
+
+def write_guard_enabled():
+    return os.environ.get(WRITE_GUARD_ENV_VAR, "").strip().lower() in ("1", "true", "yes")
+
+
+class DatasetView:
+    """Read-only rows of the sales data (derived Year/Quarter/Month columns included)."""
+
+    __slots__ = ("_frame",)
+
+    def __init__(self, frame):
+        object.__setattr__(self, "_frame", frame)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("DatasetView is read-only")
+
+    def __len__(self):
+        return len(self._frame)
+
+    @property
+    def columns(self):
+        return tuple(self._frame.columns)
+
+    def __getitem__(self, key):
+        """A column (Series) by name, or the view of the rows where a boolean mask is True."""
+        if isinstance(key, str):
+            return self._frame[key]
+        return DatasetView(self._frame[key])
+
+    def __setitem__(self, key, value):
+        raise TypeError("DatasetView is read-only, derive new frames from to_frame() instead")
+
+    def take(self, positions):
+        """View of the rows at ``positions``."""
+        return DatasetView(self._frame.take(positions))
+
+    def to_frame(self, columns=None):
+        """DataFrame of the rows (all or only ``columns``), for plotting libraries.
+
+        The frame shares memory with the view under Copy-on-Write, writing to it
+        copies the written columns and leaves the shared data unchanged.
+        """
+        frame = self._frame if columns is None else self._frame[list(columns)]
+        return frame.copy(deep=not pd.get_option("mode.copy_on_write"))
+
+
+def fingerprint(frame):
+    """Columns, dtypes and a hash of every value of ``frame``."""
+    hashes = tuple(int(pd.util.hash_pandas_object(frame[col], index=False).sum()) for col in frame.columns)
+    return tuple(frame.columns), tuple(map(str, frame.dtypes)), len(frame), hashes
+
+
+@contextlib.contextmanager
+def write_guard(frame, name="frame"):
+    """Raise RuntimeError if ``frame`` was modified inside the block."""
+    before = fingerprint(frame)
+    yield
+    after = fingerprint(frame)
+    if after != before:
+        changed = [col for col, old, new in zip(before[0], before[3], after[3]) if old != new]
+        raise RuntimeError(
+            f"The shared {name} was modified in place: columns {before[0]} -> {after[0]}, "
+            f"rows {before[2]} -> {after[2]}, changed values in {changed}"
+        )
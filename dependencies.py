@@ -0,0 +1,42 @@
+"""Import-time dependency check for the dashboard.
+
+The check runs once per process when this module is first imported. Streamlit
+reruns reuse the imported module, so reruns never probe packages, touch the
+filesystem or call pip. Packages are located with ``importlib.util.find_spec``
+which does not import them. Install everything ahead of time with
+``pip install -r requirements.txt``.
+"""
+import importlib.util
+import sys
+
+
+# import name -> pip package name
+REQUIRED_PACKAGES = {
+    "streamlit": "streamlit",
+    "streamlit_option_menu": "streamlit-option-menu",
+    "pandas": "pandas",
+    "numpy": "numpy",
+    "pyarrow": "pyarrow",
+    "duckdb": "duckdb",
+    "plotly": "plotly",
+    "pyecharts": "pyecharts",
+    "streamlit_echarts": "streamlit-echarts",
+}
+
+
+def find_missing_packages(packages=REQUIRED_PACKAGES):
+    """Pip names of the packages that cannot be imported."""
+    return [pip_name for module, pip_name in packages.items() if importlib.util.find_spec(module) is None]
+
+
+def missing_packages_message(missing):
+    return (
+        f"Missing required packages: {', '.join(missing)}. "
+        f"Install them with `pip install -r requirements.txt` (or `pip install {' '.join(missing)}`)."
+    )
+
+
+MISSING_PACKAGES = find_missing_packages()
+
+if MISSING_PACKAGES:
+    print(missing_packages_message(MISSING_PACKAGES), file=sys.stderr)
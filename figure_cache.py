@@ -0,0 +1,186 @@
+"""Memoization of the page charts.
+
+Building a chart (aggregation, plotly.express, validation) takes far longer than
+sending it to the browser. ``FigureCache`` keeps the serialized JSON of the
+charts keyed on (dataset version, page, normalized sidebar filters, chart id),
+so switching back to a page or toggling a filter back to a previous value
+reuses the figure instead of rebuilding it. Entries expire after a TTL and are
+evicted least recently used first when the cache holds too many entries or
+more JSON than the memory cap.
+
+One cache is shared by all sessions of the process (see
+``data_loader.load_figure_cache``). Pages use it through a ``FigureScope``
+bound to the dataset version, page and filters of the current rerun, chart ids
+include the page widgets a chart depends on.
+
+Charts of a page do not depend on each other. Pages submit all of them first
+(``FigureScope.submit_plotly`` / ``submit_json``), the misses are built
+concurrently on a thread pool shared by the sessions (``SALES_CHART_WORKERS``
+threads, see ``data_loader.load_chart_executor``), and then shown in layout
+order, so a page waits for its slowest chart instead of the sum of all of them.
+Builds run outside the script thread and must not call ``st.*``.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from filter_index import filter_key
+from settings import env_int
+
+
+FIGURE_CACHE_MAX_ENTRIES = 256
+FIGURE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+FIGURE_CACHE_TTL = 60 * 60  # seconds
+
+CHART_WORKERS_ENV_VAR = "SALES_CHART_WORKERS"
+DEFAULT_CHART_WORKERS = 4
+
+
+def chart_workers():
+    """Threads building charts concurrently (1 builds them in sequence on the script thread)."""
+    return env_int(CHART_WORKERS_ENV_VAR, min(DEFAULT_CHART_WORKERS, os.cpu_count() or 1), minimum=1)
+
+
+class FigureCache:
+    """Thread-safe LRU cache of serialized figures with a TTL and a memory cap."""
+
+    def __init__(self, max_entries=FIGURE_CACHE_MAX_ENTRIES, max_bytes=FIGURE_CACHE_MAX_BYTES,
+                 ttl=FIGURE_CACHE_TTL, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (created, text), least recently used first
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        """Size of the cached JSON (characters, which is bytes for ASCII JSON)."""
+        return self._nbytes
+
+    def _remove(self, key):
+        _, text = self._entries.pop(key)
+        self._nbytes -= len(text)
+
+    def get(self, key):
+        """Cached text of ``key``, None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._clock() - entry[0] > self.ttl:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, text):
+        """Store ``text``, evicting the least recently used entries over the limits."""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if len(text) > self.max_bytes:
+                return  # would evict everything else
+            self._entries[key] = (self._clock(), text)
+            self._nbytes += len(text)
+            while len(self._entries) > self.max_entries or self._nbytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def get_or_build(self, key, build):
+        """Cached text of ``key``, calling ``build()`` to create it on a miss.
+
+        ``build`` runs outside the lock, concurrent misses of one key may both build.
+        """
+        text = self.get(key)
+        if text is None:
+            text = build()
+            self.put(key, text)
+        return text
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+
+class FigureScope:
+    """The figure cache seen from one page rerun.
+
+    ``chart_id`` is any hashable, pages add the values of their own widgets to it.
+    With a ``profile`` (instrumentation.RerunProfile) every chart records its
+    total time and payload size, and on a miss the build and serialize times.
+    With an ``executor`` submitted charts are built on its threads, without one
+    they are built when submitted.
+    """
+
+    def __init__(self, cache, version, page, filters, profile=None, executor=None):
+        self.cache = cache
+        self.prefix = (version, page, filter_key(filters))
+        self.profile = profile
+        self.executor = executor
+
+    def key(self, chart_id):
+        return self.prefix + (chart_id,)
+
+    def _timed(self, name, function):
+        if self.profile is None:
+            return function
+        def timed():
+            with self.profile.span(name):
+                return function()
+        return timed
+
+    @staticmethod
+    def _name(chart_id):
+        return f"chart/{chart_id[0] if isinstance(chart_id, tuple) else chart_id}"
+
+    def _cached(self, chart_id, make_text):
+        start = time.perf_counter()
+        text = self.cache.get_or_build(self.key(chart_id), make_text)
+        figure = json.loads(text)
+        if self.profile is not None:
+            self.profile.add(self._name(chart_id), (time.perf_counter() - start) * 1000, len(text))
+        return figure
+
+    def json(self, chart_id, build):
+        """Parsed JSON of the chart, ``build()`` returns the JSON text on a miss."""
+        return self._cached(chart_id, self._timed(f"{self._name(chart_id)}/build", build))
+
+    def plotly(self, chart_id, build):
+        """Figure dict for ``st.plotly_chart``, ``build()`` returns the Plotly figure on a miss."""
+        name = self._name(chart_id)
+
+        def make_text():
+            figure = self._timed(f"{name}/build", build)()
+            return self._timed(f"{name}/serialize", figure.to_json)()
+        return self._cached(chart_id, make_text)
+
+    def submit(self, function, *args):
+        """Future of ``function(*args)``, run on the executor if there is one."""
+        if self.executor is not None:
+            return self.executor.submit(function, *args)
+        future = Future()
+        try:
+            future.set_result(function(*args))
+        except Exception as err:
+            future.set_exception(err)
+        return future
+
+    def submit_json(self, chart_id, build):
+        """Future of ``json(chart_id, build)``."""
+        return self.submit(self.json, chart_id, build)
+
+    def submit_plotly(self, chart_id, build):
+        """Future of ``plotly(chart_id, build)``."""
+        return self.submit(self.plotly, chart_id, build)
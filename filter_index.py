@@ -0,0 +1,107 @@
+"""Bitmap index for the sidebar filters.
+
+For every sidebar filter column the index keeps one packed bitmap (1 bit per row)
+per distinct value. A selection ORs the bitmaps of the selected values within a
+column and ANDs the columns together, so filtering never rescans the string
+columns. Bitmaps refer to row positions, so the index works with any column
+projection of the same snapshot (all projections share the row order).
+
+Only the sidebar columns are indexed: the other dimensions are filtered by the
+query backend, and their bitmaps (Model alone has one per model) would cost
+~24 MB per million rows.
+"""
+import numpy as np
+import pandas as pd
+
+
+INDEX_COLUMNS = ["Year", "Dealer_Region"]
+
+
+def filter_key(filters):
+    """Hashable form of ``filters`` for cache keys, independent of the selection order."""
+    return tuple((col, tuple(sorted(values or ()))) for col, values in sorted(filters.items()))
+
+
+class BitmapIndex:
+    """Per-value packed bitmaps of the indexed columns, filters on other columns raise KeyError."""
+
+    def __init__(self, df, columns=INDEX_COLUMNS):
+        self.n_rows = len(df)
+        self.bitmaps = {}
+        for col in columns:
+            codes, uniques = pd.factorize(df[col], sort=False)  # uniques in order of appearance
+            self.bitmaps[col] = {
+                value: np.packbits(codes == code)
+                for code, value in enumerate(uniques.tolist())
+            }
+
+    def append(self, df):
+        """Index of the indexed rows followed by the rows of ``df``.
+
+        Returns a new index (the index may be shared, it is never modified), the
+        existing bitmaps are extended instead of rescanning the indexed rows.
+        """
+        index = BitmapIndex.__new__(BitmapIndex)
+        index.n_rows = self.n_rows + len(df)
+        index.bitmaps = {}
+        # packed bits are big-endian, the first new row lands at bit `shift` of the last byte
+        shift = self.n_rows % 8
+        n_bytes = (index.n_rows + 7) // 8
+        for col, bitmaps in self.bitmaps.items():
+            codes, uniques = pd.factorize(df[col], sort=False)
+            matches = dict(zip(uniques.tolist(), range(len(uniques))))
+            extended = {}
+            for value in list(bitmaps) + [value for value in matches if value not in bitmaps]:
+                old = bitmaps.get(value)
+                if old is None:
+                    old = np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+                if value not in matches:
+                    extended[value] = np.concatenate([old, np.zeros(n_bytes - len(old), dtype=np.uint8)])
+                    continue
+                new = np.packbits(np.concatenate([np.zeros(shift, dtype=bool), codes == matches[value]]))
+                if shift:
+                    new[0] |= old[-1]
+                    old = old[:-1]
+                extended[value] = np.concatenate([old, new])
+            index.bitmaps[col] = extended
+        return index
+
+    def values(self, column):
+        """Distinct values of ``column`` in order of appearance."""
+        return list(self.bitmaps[column])
+
+    def bitmap(self, filters):
+        """Packed bitmap of the rows matching ``filters`` ({column: values}).
+
+        Returns None when no filter narrows the selection (all rows match).
+        Columns with empty or None values are not filtered.
+        """
+        selection = None
+        for col, values in filters.items():
+            if values is None or len(values) == 0:
+                continue
+            bitmaps = self.bitmaps[col]
+            selected = [bitmaps[value] for value in dict.fromkeys(values) if value in bitmaps]
+            if len(selected) == len(bitmaps):
+                continue  # every value selected, column does not narrow anything
+            column_bits = np.bitwise_or.reduce(selected) if selected else np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+            selection = column_bits if selection is None else selection & column_bits
+        return selection
+
+    def rows(self, filters):
+        """Row positions matching ``filters``, or None when all rows match."""
+        selection = self.bitmap(filters)
+        if selection is None:
+            return None
+        return np.flatnonzero(np.unpackbits(selection, count=self.n_rows))
+
+    def select(self, df, filters):
+        """Rows of ``df`` matching ``filters``.
+
+        ``df`` is returned as is (no copy) when the filters keep every row,
+        otherwise only the matching rows of its columns are gathered.
+        """
+        rows = self.rows(filters)
+        if rows is None:
+            return df
+        return df.take(rows)
@@ -0,0 +1,89 @@
+"""Append-only ingestion of new sales rows.
+
+Dealers send daily batches with the columns of the raw CSV. ``append_batch``
+validates a batch (a CSV file or buffer, or an Arrow table or record batch),
+parses ``Date`` as dd/mm/YYYY (rows whose date does not parse are dropped, as
+on a full load), derives Year/Quarter/Month, casts the rows to the snapshot
+dtypes and stores them as an appended part next to the snapshot (see
+data_loader.py). On the next rerun the cached frames, cube and filter index
+are extended with the new rows instead of being rebuilt from scratch.
+
+Appended rows are not written to the CSV. A new full CSV export supersedes the
+parts appended before it.
+
+Usage (from the repository root):
+
+    python ingest.py new_rows.csv [more_rows.csv ...]
+"""
+import argparse
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from data_loader import CSV_DTYPES, DATA_PATH, ensure_snapshot, prepare_sales_data, write_append_part
+from schema import fits_dtype
+
+
+def read_batch(source):
+    """Raw batch as a frame, ``source`` is a CSV path or buffer, or an Arrow table or record batch."""
+    if isinstance(source, (pa.Table, pa.RecordBatch)):
+        return source.to_pandas()
+    return pd.read_csv(source, dtype=str)
+
+
+def validate_batch(df, dtypes=None):
+    """Return the batch with the CSV columns and dtypes, raise ValueError if it does not match.
+
+    ``dtypes`` are the snapshot dtypes, integer values out of their range are rejected.
+    """
+    missing = [col for col in CSV_DTYPES if col not in df.columns]
+    unexpected = [col for col in df.columns if col not in CSV_DTYPES]
+    if missing or unexpected:
+        raise ValueError(f"Batch does not match the sales schema, missing columns: {missing}, "
+                         f"unexpected columns: {unexpected}")
+    try:
+        # text columns are kept as read, numeric columns must convert without loss
+        df = df[list(CSV_DTYPES)].astype({col: dtype for col, dtype in CSV_DTYPES.items() if dtype is not str})
+    except (TypeError, ValueError) as err:
+        raise ValueError(f"Batch does not match the sales schema: {err}") from err
+    # the snapshot dtypes are downcast, a value out of their range would wrap
+    overflow = [col for col, dtype in (dtypes if dtypes is not None else {}).items()
+                if col in CSV_DTYPES and pd.api.types.is_integer_dtype(dtype) and not fits_dtype(df[col], dtype)]
+    if overflow:
+        raise ValueError(f"Batch does not match the sales schema, values out of the range of the snapshot "
+                         f"dtypes in columns: {overflow}")
+    return df
+
+
+def snapshot_dtypes(snapshot_path):
+    """Column dtypes of the snapshot, read from the Parquet schema only."""
+    return pq.read_schema(snapshot_path).empty_table().to_pandas().dtypes
+
+
+def append_batch(source, csv_path=DATA_PATH):
+    """Validate, prepare and store a batch of new rows, return the number of rows appended."""
+    dtypes = snapshot_dtypes(ensure_snapshot(csv_path))
+    rows = prepare_sales_data(validate_batch(read_batch(source), dtypes))
+    if rows.empty:
+        return 0
+
+    # categories of the batch are merged with the snapshot ones when the parts are loaded
+    rows = rows[list(dtypes.index)].astype({
+        col: "category" if isinstance(dtype, pd.CategoricalDtype) else dtype for col, dtype in dtypes.items()
+    })
+    write_append_part(rows, csv_path)
+    return len(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("batches", nargs="+", help="CSV files with new sales rows")
+    args = parser.parse_args(argv)
+
+    for path in args.batches:
+        print(f"{path}: {append_batch(path)} rows appended")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Latency instrumentation of the dashboard reruns.
+
+Every rerun records a ``RerunProfile``: named spans for the data load, the
+filters, every aggregation of the query backend (through ``InstrumentedSource``),
+every chart build and serialization (through ``figure_cache.FigureScope``) and
+the page render, with the JSON payload size of each chart. When the rerun ends
+the spans are added to the process-wide ``LatencyStats`` (last
+``MAX_SAMPLES`` samples per span) and written as one JSON line to the
+``sales_dashboard.latency`` logger, together with the rolling p50/p95 of the
+page. Unless logging was configured for it, the logger writes at INFO level to
+stderr, or to the file named by the ``SALES_LATENCY_LOG`` environment variable.
+Setting the ``SALES_DEBUG_PANEL`` environment variable also shows the
+spans and the percentiles in a sidebar panel.
+"""
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+
+DEBUG_PANEL_ENV_VAR = "SALES_DEBUG_PANEL"
+LATENCY_LOG_ENV_VAR = "SALES_LATENCY_LOG"
+MAX_SAMPLES = 1000
+
+logger = logging.getLogger("sales_dashboard.latency")
+_logger_lock = threading.Lock()
+
+
+def latency_logger():
+    """The latency logger, given a handler and the INFO level on first use if it has none."""
+    with _logger_lock:
+        if not logger.handlers:
+            path = os.environ.get(LATENCY_LOG_ENV_VAR, "").strip()
+            handler = logging.FileHandler(path) if path else logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+            logger.addHandler(handler)
+            if logger.level == logging.NOTSET:
+                logger.setLevel(logging.INFO)
+    return logger
+
+
+def debug_panel_enabled():
+    return os.environ.get(DEBUG_PANEL_ENV_VAR, "").strip().lower() in ("1", "true", "yes")
+
+
+class LatencyStats:
+    """Rolling latency samples per span name, shared by all sessions."""
+
+    def __init__(self, max_samples=MAX_SAMPLES):
+        self._samples = defaultdict(lambda: deque(maxlen=max_samples))
+        self._lock = threading.Lock()
+
+    def record(self, name, ms):
+        with self._lock:
+            self._samples[name].append(ms)
+
+    def percentiles(self, name, qs=(50, 95)):
+        with self._lock:
+            samples = list(self._samples.get(name, ()))
+        return np.percentile(samples, qs) if samples else np.full(len(qs), np.nan)
+
+    def summary(self):
+        """count, p50, p95 and max (ms) per span name."""
+        with self._lock:
+            samples = {name: np.array(values) for name, values in self._samples.items()}
+        rows = {
+            name: {"count": len(values), "p50_ms": np.percentile(values, 50),
+                   "p95_ms": np.percentile(values, 95), "max_ms": values.max()}
+            for name, values in samples.items() if len(values)
+        }
+        return pd.DataFrame.from_dict(rows, orient="index").sort_values("p95_ms", ascending=False)
+
+
+class RerunProfile:
+    """Spans (name, milliseconds, payload bytes) recorded during one rerun."""
+
+    def __init__(self, page):
+        self.page = page
+        self.spans = []
+        self._start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - start) * 1000)
+
+    def add(self, name, ms, nbytes=None):
+        self.spans.append({"name": name, "ms": round(ms, 3), "bytes": nbytes})
+
+    def frame(self):
+        return pd.DataFrame(self.spans, columns=["name", "ms", "bytes"])
+
+    def finish(self, stats):
+        """Record the spans and the rerun total in ``stats`` and log the rerun, returns the total ms."""
+        total = (time.perf_counter() - self._start) * 1000
+        page_total = f"{self.page}/total"
+        for span in self.spans:
+            stats.record(f"{self.page}/{span['name']}", span["ms"])
+        stats.record(page_total, total)
+        p50, p95 = stats.percentiles(page_total)
+        latency_logger().info(json.dumps({
+            "page": self.page,
+            "total_ms": round(total, 3),
+            "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3),
+            "spans": self.spans,
+        }))
+        return total
+
+
+class InstrumentedSource:
+    """Query backend (``SalesCube`` or ``DuckDBSource``) whose aggregations are timed."""
+
+    TIMED = ("rollup", "summary", "kpis", "top_value", "distinct", "distinct_values", "price_quantile")
+
+    def __init__(self, source, profile):
+        self.source = source
+        self.profile = profile
+
+    def where(self, filters):
+        with self.profile.span("aggregate/where"):
+            return InstrumentedSource(self.source.where(filters), self.profile)
+
+    def __getattr__(self, name):
+        attr = getattr(self.source, name)
+        if name not in self.TIMED:
+            return attr
+
+        def timed(*args, **kwargs):
+            with self.profile.span(f"aggregate/{name}"):
+                return attr(*args, **kwargs)
+        return timed
+
+    def __len__(self):
+        return len(self.source)
+
+
+def render_debug_panel(profile, stats, total_ms):
+    """Sidebar panel with the spans of this rerun and the rolling percentiles."""
+    with st.sidebar.expander("Latency (debug)"):
+        st.write(f"This rerun: {total_ms:,.0f} ms")
+        st.dataframe(profile.frame(), hide_index=True)
+        st.write("Rolling percentiles (ms)")
+        st.dataframe(stats.summary())
@@ -0,0 +1,100 @@
+"""Headline metrics (KPIs) of the pages in one pass.
+
+The totals and the top values of the metrics row come from the query source in
+a single call (``kpis`` of ``cube.SalesCube`` and ``query_backend.DuckDBSource``):
+the cube reduces its cells once, DuckDB answers everything with one
+``GROUPING SETS`` query.
+
+Only the median price and the number of distinct customers need the rows. They
+are exact up to ``SALES_APPROX_KPI_ROWS`` selected rows (1,000,000 if unset,
+0 approximates always). Above it the median comes from the price sketch of
+the source and the distinct count from a HyperLogLog sketch of the values
+(``approx_distinct``, ~1% error), so the metrics never sort or hash-set the
+selected rows.
+
+The threshold is where the approximation gets cheaper: the exact median costs
+~24 ms per million selected prices (~300 ms for 10M), the median of the cube
+sketch ~8 ms whatever the selection (one bincount over the sketch, ~390k rows
+for 1M rows of data). ``benchmarks/page_scaling.py`` times both ("median
+exact" and "median sketch" steps). The DuckDB backend has no precomputed
+sketch, its ``approx_quantile`` scans the selection (~170 ms per million
+prices), so its pages always take the exact median.
+"""
+import numpy as np
+import pandas as pd
+
+from settings import env_int
+
+
+APPROX_ROWS_ENV_VAR = "SALES_APPROX_KPI_ROWS"
+DEFAULT_APPROX_ROWS = 1_000_000
+
+# 2**14 registers, standard error 1.04 / sqrt(2**14) ~ 0.8%
+HLL_PRECISION = 14
+
+
+def approx_rows():
+    """Number of selected rows above which the median and distinct counts are approximated."""
+    return env_int(APPROX_ROWS_ENV_VAR, DEFAULT_APPROX_ROWS)
+
+
+def approximate(n_rows):
+    """True if the metrics of ``n_rows`` selected rows are approximated."""
+    return n_rows > approx_rows()
+
+
+def value_hashes(values):
+    """64-bit hashes of the non-null ``values`` (a Series), categories are hashed once."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = values.cat.codes.to_numpy()
+        return pd.util.hash_array(values.cat.categories.to_numpy())[codes[codes >= 0]]
+    return pd.util.hash_pandas_object(values.dropna(), index=False).to_numpy()
+
+
+def _bit_length(values):
+    # exact for uint64: both 32-bit halves are exact in float64
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(high > 0, np.frexp(high)[1] + 32, np.frexp(low)[1])
+
+
+def hll_registers(hashes, precision=HLL_PRECISION):
+    """HyperLogLog registers of the 64-bit ``hashes``, registers of several inputs merge with ``np.maximum``."""
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    index = (hashes >> np.uint64(64 - precision)).astype(np.intp)
+    # position of the first 1 bit after the index bits, the extra low bit caps it at 65 - precision
+    rest = (hashes << np.uint64(precision)) | np.uint64(1 << (precision - 1))
+    rank = (65 - _bit_length(rest)).astype(np.intp)
+    # occurrences of every (register, rank) pair, a register holds its highest rank seen (0 if none)
+    seen = np.bincount(index * 64 + rank, minlength=64 << precision).reshape(-1, 64) > 0
+    return np.where(seen.any(axis=1), 63 - np.argmax(seen[:, ::-1], axis=1), 0).astype(np.uint8)
+
+
+def hll_estimate(registers):
+    """Number of distinct values estimated from HyperLogLog registers."""
+    m = len(registers)
+    estimate = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+    zeros = np.count_nonzero(registers == 0)
+    if estimate <= 2.5 * m and zeros:
+        # small cardinalities: linear counting of the empty registers
+        estimate = m * np.log(m / zeros)
+    return int(round(estimate))
+
+
+def approx_distinct(values, precision=HLL_PRECISION):
+    """Approximate number of distinct non-null ``values`` (a Series)."""
+    return hll_estimate(hll_registers(value_hashes(values), precision))
+
+
+def distinct_count(values):
+    """Number of distinct non-null ``values`` (a Series).
+
+    Categoricals are counted exactly from their codes, one bincount is cheaper
+    than hashing. Other values are approximated above SALES_APPROX_KPI_ROWS rows.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = values.cat.codes.to_numpy()
+        return int(np.count_nonzero(np.bincount(codes[codes >= 0], minlength=len(values.cat.categories))))
+    if approximate(len(values)):
+        return approx_distinct(values)
+    return values.nunique()
@@ -0,0 +1,187 @@
+"""Data behind the page charts and metrics, without any Streamlit or Plotly.
+
+Every function takes the query source of the sidebar filters (the sales cube
+or the DuckDB source, see query_backend.py) and returns a small result frame
+(one row per dealer, company/model, period, ...) or a dict of metrics. The
+pages only lay these results out, so the computations can be cached,
+benchmarked (benchmarks/page_scaling.py) or run off the UI thread on their own.
+"""
+from comparison import period_over_period
+from kpi import approximate, distinct_count
+from ranking import OTHERS, top_n, truncate_labels
+from time_dimension import period_labels
+
+
+# state of the city of each dealer region, for the map
+REGION_STATES = {
+    'Middletown': 'OH',
+    'Aurora': 'IL',
+    'Greenville': 'SC',
+    'Pasco': 'WA',
+    'Janesville': 'WI',
+    'Scottsdale': 'AZ',
+    'Austin': 'TX',
+}
+
+SHORT_NAME_LENGTH = 20
+
+
+############################## Sales Trend ##############################
+
+def sales_metrics(source, prices):
+    """Sales volume, revenue, average order and price range from the source, median of the ``prices`` Series.
+
+    The median is exact up to SALES_APPROX_KPI_ROWS prices, then read from the price sketch of the source if it
+    has a precomputed one (see kpi.py).
+    """
+    approximate_median = source.PRECOMPUTED_MEDIAN and approximate(len(prices))
+    totals = source.kpis(median=approximate_median)
+    return {
+        'total_sales': totals['count'],
+        'total_revenue': totals['price_sum'],
+        'avg_order_revenue': totals['price_sum'] / totals['count'],
+        'max_price': totals['price_max'],
+        'min_price': totals['price_min'],
+        'median_price': totals['median'] if approximate_median else prices.median(),
+    }
+
+
+def sales_over_time(source, time_dimension):
+    """(volume, revenue, x column) per Year, Quarter or Month period, sorted by period.
+
+    ``volume`` has the period labels and 'Sales Volume', ``revenue`` the periods
+    (integer years, or labels) and 'Price ($)'.
+    """
+    time_columns = {"Year": ['Year'], "Quarter": ['Year', 'Quarter']}.get(time_dimension, ['Year', 'Month'])
+    x_col = time_columns[-1]
+    sales = source.rollup(time_columns).sort_values(by=time_columns)
+
+    volume = sales[time_columns + ['count']].rename(columns={'count': 'Sales Volume'})
+    volume[x_col] = period_labels(volume, x_col)
+    volume = volume[[x_col, 'Sales Volume']]
+
+    revenue = sales[time_columns + ['price_sum']].rename(columns={'price_sum': 'Price ($)'})
+    if x_col == 'Year':
+        revenue = revenue.astype({'Year': int, 'Price ($)': int})
+    else:
+        revenue[x_col] = period_labels(revenue, x_col)
+    revenue = revenue[[x_col, 'Price ($)']]
+    return volume, revenue, x_col
+
+
+def comparison_years(source, n=2):
+    """The last ``n`` years with sales."""
+    return tuple(source.distinct_values('Year')[-n:])
+
+
+def quarterly_comparison(source, years=None):
+    """(revenue, growth) of two years per quarter, the last two years with sales if ``years`` is None.
+
+    ``revenue`` has Year (label), Quarter and 'Price ($)' sorted by year and
+    quarter, ``growth`` is the percent change from the first to the second year
+    indexed by quarter (see comparison.py), empty if there is only one year.
+    """
+    years = comparison_years(source) if years is None else tuple(years)
+    source = source.where({'Year': list(years)})
+    revenue = source.rollup(['Year', 'Quarter'])
+    revenue = revenue[['Year', 'Quarter', 'price_sum']].rename(columns={'price_sum': 'Price ($)'})
+    revenue = revenue.astype({'Quarter': int, 'Year': str}).sort_values(by=['Year', 'Quarter'])
+
+    # the same quarter of the first year is 4 quarters per year before (nothing to compare with a single year)
+    first, last = (years[0], years[-1]) if years else (0, 0)
+    growth = period_over_period(source, 'Quarter', lag=4 * max(last - first, 1))
+    growth = growth[growth['Year'] == last].set_index('Quarter')['Growth (%)']
+    return revenue, growth
+
+
+def monthly_revenue(source):
+    """Revenue per calendar month (all years together), Month as '1' to '12' in month order."""
+    monthly = source.rollup('Month')[['Month', 'price_sum']].rename(columns={'price_sum': 'Price ($)'})
+    monthly = monthly.astype({'Month': int}).sort_values(by='Month')
+    return monthly.astype({'Month': str})
+
+
+############################## Customer ##############################
+
+def customer_metrics(source, customers):
+    """Top selling brand, model and color from the source, number of distinct ``customers`` names (see kpi.py)."""
+    top = source.kpis(top=('Company', 'Model', 'Color'))['top']
+    return {
+        'top_brand': top['Company'],
+        'top_model': top['Model'],
+        'top_color': top['Color'],
+        'unique_customers': distinct_count(customers),
+    }
+
+
+def color_share(source):
+    """Sales count per color, largest first."""
+    return source.rollup('Color').set_index('Color')['count'].sort_values(ascending=False)
+
+
+def brand_sales(source, n=None, others=False):
+    """Company and 'Sales Count' of the ``n`` best selling companies (SALES_TOP_N if None), largest first.
+
+    With ``others`` the remaining companies are summed up in an 'Others' row.
+    """
+    counts = top_n(source.rollup('Company').set_index('Company')['count'], n, OTHERS if others else None)
+    return counts.reset_index().set_axis(['Company', 'Sales Count'], axis=1)
+
+
+def gender_body_style(source):
+    """Sales count per Gender and Body Style."""
+    matrix = source.rollup(['Gender', 'Body Style'])
+    return matrix[['Gender', 'Body Style', 'count']].rename(columns={'count': 'Count'})
+
+
+############################## Dealer ##############################
+
+def dealer_metrics(source):
+    """Top selling dealer and region, number of companies and dealers."""
+    kpis = source.kpis(top=('Dealer_Name', 'Dealer_Region'), distinct=('Company', 'Dealer_Name'))
+    return {
+        'top_dealer': kpis['top']['Dealer_Name'],
+        'top_region': kpis['top']['Dealer_Region'],
+        'companies': kpis['distinct']['Company'],
+        'dealers': kpis['distinct']['Dealer_Name'],
+    }
+
+
+def dealer_sales(source, n=None, others=False):
+    """Dealer_Name, Sales and shorter_name of the ``n`` best selling dealers (SALES_TOP_N if None).
+
+    Ascending by sales, so the bar chart draws the best dealer on top. With
+    ``others`` the remaining dealers are summed up in a first 'Others' row.
+    """
+    sales = source.rollup('Dealer_Name').set_index('Dealer_Name')['count']
+    top = top_n(sales, n, OTHERS if others else None).rename('Sales').reset_index().iloc[::-1]
+    return top.assign(shorter_name=truncate_labels(top['Dealer_Name'], SHORT_NAME_LENGTH))
+
+
+def company_model_sales(source, n=None):
+    """Company, Model, model_nb (model sales) and Total_Sales (company sales) of the ``n`` best selling companies.
+
+    ``n`` is SALES_TOP_N if None. Sorted by company total, then model sales, largest first.
+    """
+    company_totals = top_n(source.rollup('Company').set_index('Company')['count'], n)
+    company_totals = company_totals.rename('Total_Sales').reset_index()
+
+    model_sales = source.where({'Company': company_totals['Company'].tolist()}).rollup(['Company', 'Model'])
+    model_sales = model_sales[['Company', 'Model', 'count']].rename(columns={'count': 'model_nb'})
+    model_sales = model_sales.merge(company_totals, on='Company')
+    return model_sales.sort_values(['Total_Sales', 'model_nb'], ascending=[False, False])
+
+
+def region_sales(source):
+    """Dealer_Region, Sales and State of every region."""
+    sales = source.rollup('Dealer_Region')[['Dealer_Region', 'count']].rename(columns={'count': 'Sales'})
+    return sales.assign(State=sales['Dealer_Region'].map(REGION_STATES))
+
+
+def region_monthly_share(source):
+    """YearMonth ('YYYY-MM'), Dealer_Region, Sales and SalesShare (% of the month's sales)."""
+    monthly = source.rollup(['Year', 'Month', 'Dealer_Region'])
+    monthly = monthly.assign(YearMonth=period_labels(monthly, 'YearMonth'))
+    monthly = monthly[['YearMonth', 'Dealer_Region', 'count']].rename(columns={'count': 'Sales'})
+    month_totals = monthly.groupby('YearMonth')['Sales'].transform('sum')
+    return monthly.assign(SalesShare=monthly['Sales'] / month_totals * 100)
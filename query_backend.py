@@ -0,0 +1,164 @@
+"""Pluggable query backends for the page aggregations.
+
+Pages only use the aggregation interface of ``cube.SalesCube`` (``where``,
+``rollup``, ``summary``, ``kpis``, ``top_value``, ``distinct``,
+``distinct_values`` and ``price_quantile``). Two backends implement it:
+
+- ``pandas``: the in-memory sales cube (default).
+- ``duckdb``: SQL over the Parquet snapshot. Filters are pushed down as WHERE
+  clauses and only the small aggregated result is materialized, so the history
+  does not have to fit in the memory of every Streamlit worker.
+
+The backend is selected with the ``SALES_QUERY_BACKEND`` environment variable,
+which allows A/B timing of the same pages on both engines.
+"""
+import os
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+
+BACKENDS = ("pandas", "duckdb")
+BACKEND_ENV_VAR = "SALES_QUERY_BACKEND"
+PRICE = "Price ($)"
+
+
+def backend_name():
+    """Backend selected through the environment (pandas if unset)."""
+    name = os.environ.get(BACKEND_ENV_VAR, "pandas").strip().lower()
+    if name not in BACKENDS:
+        raise ValueError(f"{BACKEND_ENV_VAR} must be one of {BACKENDS}, got {name!r}")
+    return name
+
+
+def _quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+# totals of the selection, the sum of no rows is 0 as in the cube
+_TOTALS = (
+    f"count(*) AS count, CAST(COALESCE(sum({_quote(PRICE)}), 0) AS BIGINT) AS price_sum, "
+    f"min({_quote(PRICE)}) AS price_min, max({_quote(PRICE)}) AS price_max"
+)
+
+
+class DuckDBSource:
+    """Aggregations over a Parquet file computed by DuckDB.
+
+    Instances are immutable, ``where`` returns a new source with the extra
+    conditions, so a source restricted to the sidebar filters can be shared.
+    """
+
+    # approx_quantile scans the selected prices, slower than the exact pandas median
+    PRECOMPUTED_MEDIAN = False
+
+    def __init__(self, parquet_path, connection=None, conditions=()):
+        self.parquet_path = parquet_path
+        self.connection = connection or duckdb.connect()
+        self.conditions = conditions
+
+    def where(self, filters):
+        """Restrict the source to rows whose values are in ``filters`` ({column: values}).
+
+        Empty or None values leave the column unfiltered.
+        """
+        conditions = list(self.conditions)
+        for col, values in filters.items():
+            if values is None or len(values) == 0:
+                continue
+            conditions.append((col, tuple(dict.fromkeys(values))))
+        return DuckDBSource(self.parquet_path, self.connection, tuple(conditions))
+
+    def _query(self, select, group_by=(), order_by=None, limit=None, grouping_sets=None):
+        params = [self.parquet_path]
+        sql = f"SELECT {select} FROM read_parquet(?)"
+        if self.conditions:
+            clauses = []
+            for col, values in self.conditions:
+                clauses.append(f"{_quote(col)} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+            sql += " WHERE " + " AND ".join(clauses)
+        if group_by:
+            sql += " GROUP BY " + ", ".join(_quote(col) for col in group_by)
+        if grouping_sets is not None:
+            sets = ", ".join("(" + ", ".join(_quote(col) for col in columns) + ")" for columns in grouping_sets)
+            sql += f" GROUP BY GROUPING SETS ({sets})"
+        if order_by:
+            sql += " ORDER BY " + order_by
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        # a cursor per query keeps the shared connection usable from several sessions
+        return self.connection.cursor().execute(sql, params).df()
+
+    def rollup(self, by):
+        """Aggregate by ``by``, returns count, price_sum, price_min and price_max."""
+        by = [by] if isinstance(by, str) else list(by)
+        columns = ", ".join(_quote(col) for col in by)
+        return self._query(
+            f"{columns}, count(*) AS count, CAST(sum({_quote(PRICE)}) AS BIGINT) AS price_sum, "
+            f"min({_quote(PRICE)}) AS price_min, max({_quote(PRICE)}) AS price_max",
+            group_by=by,
+            order_by=columns,
+        )
+
+    def summary(self):
+        """Totals as a dict (count, price_sum, price_min, price_max), like the cube: 0, 0, NaN, NaN if empty."""
+        row = self._query(_TOTALS).iloc[0]
+        return {key: np.nan if pd.isna(value) else value for key, value in row.to_dict().items()}
+
+    def kpis(self, top=(), distinct=(), median=False):
+        """Headline metrics in one query, same result as ``SalesCube.kpis``.
+
+        The totals and the counts per ``top`` dimension are grouping sets of a
+        single scan, the median is DuckDB's approximate quantile.
+        """
+        select = _TOTALS
+        for i, dimension in enumerate(distinct):
+            select += f", count(DISTINCT {_quote(dimension)}) AS distinct_{i}"
+        if median:
+            select += f", approx_quantile({_quote(PRICE)}, 0.5) AS median"
+        if top:
+            select = ", ".join(
+                [_quote(col) for col in top] + [f"GROUPING({_quote(col)}) AS grouping_{i}" for i, col in enumerate(top)]
+            ) + ", " + select
+        result = self._query(select, grouping_sets=[()] + [(col,) for col in top])
+
+        flags = [f"grouping_{i}" for i in range(len(top))]
+        totals = result[(result[flags] == 1).all(axis=1)].iloc[0] if top else result.iloc[0]
+        kpis = {key: np.nan if pd.isna(totals[key]) else totals[key] for key in ("count", "price_sum", "price_min", "price_max")}
+        kpis["top"] = {}
+        for flag, dimension in zip(flags, top):
+            counts = result[(result[flag] == 0) & result[dimension].notna()]
+            counts = counts.sort_values(["count", dimension], ascending=[False, True])
+            kpis["top"][dimension] = counts[dimension].iloc[0] if len(counts) else None
+        kpis["distinct"] = {dimension: int(totals[f"distinct_{i}"]) for i, dimension in enumerate(distinct)}
+        if median:
+            kpis["median"] = float(totals["median"])
+        return kpis
+
+    def top_value(self, dimension):
+        """Most frequent value of ``dimension`` (first one in sort order on ties)."""
+        col = _quote(dimension)
+        return self._query(col, group_by=[dimension], order_by=f"count(*) DESC, {col}", limit=1).iloc[0, 0]
+
+    def distinct(self, dimension):
+        """Number of distinct values of ``dimension``."""
+        return int(self._query(f"count(DISTINCT {_quote(dimension)})").iloc[0, 0])
+
+    def distinct_values(self, dimension):
+        """Sorted distinct non-null values of ``dimension``."""
+        col = _quote(dimension)
+        return self._query(f"DISTINCT {col}", order_by=col).iloc[:, 0].dropna().tolist()
+
+    def price_quantile(self, q, by=None):
+        """Exact price quantile(s) ``q``, same return shapes as ``SalesCube.price_quantile``."""
+        qs = [float(x) for x in np.atleast_1d(q)]
+        select = ", ".join(f"quantile_cont({_quote(PRICE)}, {x}) AS \"{x}\"" for x in qs)
+        if by is None:
+            values = self._query(select).iloc[0].to_numpy(dtype=float)
+            return values[0] if np.ndim(q) == 0 else values
+        by = [by] if isinstance(by, str) else list(by)
+        columns = ", ".join(_quote(col) for col in by)
+        result = self._query(f"{columns}, {select}", group_by=by, order_by=columns)
+        return result.rename(columns={str(x): x for x in qs})
@@ -0,0 +1,72 @@
+"""Top-N rankings of precomputed counts (dealers, companies, brands).
+
+The pages rank the counts of a rollup (one value per dealer, company, ...),
+never raw rows. ``top_positions`` selects the ``n`` largest counts with a
+partial selection (``np.partition``) and only sorts those, so a ranking costs
+O(values + n log n) instead of a full sort, which keeps the charts flat when
+the number of dealers grows into the thousands.
+
+Equal counts are ranked in label order, whatever the order of the rollup (the
+cube keeps categories in the order they were first seen, appended batches add
+theirs last). ``top_value`` and ``kpis`` of both query backends use the same
+rule, only the tied entries and the selected ones are sorted by label.
+
+The size of the rankings is read from the ``SALES_TOP_N`` environment variable
+(10 if unset). ``top_n`` can put the rest into one "Others" entry, and
+``truncate_labels`` shortens long labels without a Python loop.
+"""
+import numpy as np
+import pandas as pd
+
+from settings import env_int
+
+
+TOP_N_ENV_VAR = "SALES_TOP_N"
+DEFAULT_TOP_N = 10
+OTHERS = "Others"
+
+
+def ranking_size():
+    """Number of entries of the top-N charts."""
+    return env_int(TOP_N_ENV_VAR, DEFAULT_TOP_N, minimum=1)
+
+
+def _ranked(positions, values, labels):
+    """``positions`` by value (largest first), then by label (by position without labels)."""
+    ties = positions if labels is None else labels[positions]
+    return positions[np.lexsort((ties, -values[positions]))]
+
+
+def top_positions(values, n, labels=None):
+    """Positions of the ``n`` largest ``values``, largest first, ties in ``labels`` order (position order if None)."""
+    values = np.asarray(values)
+    labels = None if labels is None else np.asarray(labels)
+    if n >= len(values):
+        return _ranked(np.arange(len(values)), values, labels)
+    if n <= 0:
+        return np.array([], dtype=np.intp)
+    # the n-th largest value, everything above it is in, ties with it are taken in label order
+    threshold = np.partition(values, len(values) - n)[len(values) - n]
+    above = np.flatnonzero(values > threshold)
+    ties = _ranked(np.flatnonzero(values == threshold), values, labels)[:n - len(above)]
+    return _ranked(np.concatenate([above, ties]), values, labels)
+
+
+def top_n(counts, n=None, others=None):
+    """The ``n`` largest entries of the ``counts`` Series, largest first, ties in label (index) order.
+
+    With ``others`` set, the sum of the remaining entries is added last under
+    that label (only if there are any).
+    """
+    n = ranking_size() if n is None else n
+    top = counts.iloc[top_positions(counts.to_numpy(), n, counts.index.to_numpy())]
+    if others is None or len(top) == len(counts):
+        return top
+    rest = pd.Series([counts.sum() - top.sum()], index=[others])
+    return pd.concat([top.set_axis(top.index.astype(object)), rest]).rename_axis(counts.index.name).rename(counts.name)
+
+
+def truncate_labels(labels, length, suffix="..."):
+    """``labels`` (a Series) as strings, the ones longer than ``length`` cut and ended with ``suffix``."""
+    text = labels.astype(str)
+    return text.where(text.str.len() <= length, text.str[:length] + suffix)
@@ -0,0 +1,139 @@
+"""Background refresh of the sales data with an atomic version swap.
+
+Reruns do not check the data files themselves. A ``DatasetRefresher`` thread
+polls a cheap signature of the source (file stats, appended part names) every
+``SALES_REFRESH_INTERVAL`` seconds. When it changes, the thread builds the new
+version (snapshot, frames, cube, filter index, profile, see
+``data_loader.load_dataset_refresher``) off the request path and then publishes
+it by swapping one reference, so no session waits for a load.
+
+A rerun takes the published ``PublishedVersion`` once and keeps it until it
+ends, so a session whose rerun started before the swap finishes on the old
+version. The handle references the structures of its version, so the caches
+can evict them while the new version is built without the rerun losing them.
+The cached structures of an old version are released when the last rerun
+holding it is done (a finalizer on the handle). If a build fails the
+current version stays published and the error is logged, the next change of the
+source is tried again.
+
+``SALES_REFRESH_INTERVAL=0`` turns the thread off, every rerun then checks the
+source and builds a new version inline, as before.
+"""
+import logging
+import os
+import threading
+import weakref
+
+
+REFRESH_INTERVAL_ENV_VAR = "SALES_REFRESH_INTERVAL"
+DEFAULT_REFRESH_INTERVAL = 5.0  # seconds
+THREAD_NAME = "sales-data-refresh"
+
+logger = logging.getLogger("sales_dashboard.refresh")
+
+
+def refresh_interval():
+    """Seconds between two checks of the source (0: no background thread)."""
+    value = os.environ.get(REFRESH_INTERVAL_ENV_VAR, "").strip()
+    if not value:
+        return DEFAULT_REFRESH_INTERVAL
+    try:
+        interval = float(value)
+    except ValueError:
+        interval = -1
+    if interval < 0:
+        raise ValueError(f"{REFRESH_INTERVAL_ENV_VAR} must be a number of seconds >= 0, got {value!r}")
+    return interval
+
+
+class _SkipRefreshThread(logging.Filter):
+    """Drops Streamlit's missing ScriptRunContext warnings of the refresh thread, it never renders."""
+
+    def filter(self, record):
+        return record.threadName != THREAD_NAME
+
+
+class PublishedVersion:
+    """Handle of a published version: ``version`` (the cache key), the source ``signature`` it was built from
+    and the ``resources`` built for it, kept alive as long as the handle.
+    """
+
+    __slots__ = ("version", "signature", "resources", "__weakref__")
+
+    def __init__(self, version, signature, resources=None):
+        self.version = version
+        self.signature = signature
+        self.resources = resources
+
+
+class DatasetRefresher:
+    """Builds new versions of the data in the background and publishes them atomically.
+
+    ``signature()`` is called on every check and must be cheap, ``build()``
+    builds and caches everything for the current source and returns its
+    version and the structures to keep referenced with it,
+    ``release(version)`` drops the cached structures of a version that is no
+    longer used.
+    """
+
+    def __init__(self, signature, build, release=None, interval=DEFAULT_REFRESH_INTERVAL):
+        self._signature = signature
+        self._build = build
+        self._release = release
+        self.interval = interval
+        self._published = None
+        self._failed = None  # signature whose build failed, not retried until the source changes again
+        self._lock = threading.Lock()  # one build at a time
+        self._stop = threading.Event()
+        self._thread = None
+
+    def current(self):
+        """The published version, built inline for the first rerun (and for every rerun without the thread)."""
+        published = self._published
+        if published is None or self.interval == 0:
+            self.refresh()
+            published = self._published
+        return published
+
+    def refresh(self):
+        """Build and publish the source if it changed since the published version, True if it did."""
+        with self._lock:
+            signature = self._signature()
+            current = self._published
+            if current is not None and signature in (current.signature, self._failed):
+                return False
+            try:
+                version, resources = self._build()
+            except Exception:
+                self._failed = signature
+                raise
+            if current is not None and version == current.version:
+                # same data (e.g. a file touched but not changed), keep the handle the reruns hold
+                current.signature = signature
+                return False
+            published = PublishedVersion(version, signature, resources)
+            if self._release is not None:
+                finalizer = weakref.finalize(published, self._release, version)
+                finalizer.atexit = False
+            # the swap: reruns starting from now get the new version
+            self._published = published
+        logger.info("Published sales data version %s", version)
+        return True
+
+    def start(self):
+        """Start checking the source in a daemon thread (no-op when the interval is 0)."""
+        if self.interval > 0 and self._thread is None:
+            logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(_SkipRefreshThread())
+            self._thread = threading.Thread(target=self._run, name=THREAD_NAME, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Refreshing the sales data failed, the published version is kept")
@@ -0,0 +1,77 @@
+"""Server-side reduction of large scatter plots.
+
+Above a point budget a scatter is drawn from a density-aware sample: points are
+binned on a regular grid and every cell keeps at most the same number of
+points, so sparse regions and outliers stay fully visible while dense regions
+are thinned. The sample is deterministic, reruns show the same points. As an
+alternative the points can be aggregated into a grid of counts (a heatmap),
+whose size does not depend on the number of rows at all.
+
+The budget is read from the ``SALES_SCATTER_POINT_BUDGET`` environment
+variable (default ``POINT_BUDGET``).
+"""
+import numpy as np
+
+from settings import env_int
+
+
+POINT_BUDGET = 5000
+POINT_BUDGET_ENV_VAR = "SALES_SCATTER_POINT_BUDGET"
+GRID_SIZE = 64
+
+
+def point_budget():
+    """Maximum number of points sent to the browser for one scatter."""
+    return env_int(POINT_BUDGET_ENV_VAR, POINT_BUDGET, minimum=1)
+
+
+def _grid_bins(values, grid_size):
+    lo, hi = values.min(), values.max()
+    if hi == lo:
+        return np.zeros(len(values), dtype=np.int64)
+    return np.minimum(((values - lo) / (hi - lo) * grid_size).astype(np.int64), grid_size - 1)
+
+
+def _cell_quota(counts, budget):
+    """Largest per-cell cap q with sum(min(counts, q)) <= budget."""
+    lo, hi = 0, int(counts.max())
+    while lo < hi:
+        q = (lo + hi + 1) // 2
+        if np.minimum(counts, q).sum() <= budget:
+            lo = q
+        else:
+            hi = q - 1
+    return max(lo, 1)
+
+
+def density_sample(x, y, budget, grid_size=GRID_SIZE, seed=0):
+    """Sorted positions of at most ``budget`` points of (x, y), thinned per grid cell.
+
+    Points with a missing coordinate are never selected.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    valid = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+    if len(valid) <= budget:
+        return valid
+
+    cells = _grid_bins(x[valid], grid_size) * grid_size + _grid_bins(y[valid], grid_size)
+
+    # shuffle, then group by cell, the rank inside a cell picks a random subset of it
+    order = np.random.default_rng(seed).permutation(len(valid))
+    order = order[np.argsort(cells[order], kind="stable")]
+    sorted_cells = cells[order]
+    rank = np.arange(len(order)) - np.searchsorted(sorted_cells, sorted_cells)
+
+    counts = np.bincount(cells)
+    quota = _cell_quota(counts[counts > 0], budget)
+    return np.sort(valid[order[rank < quota]])
+
+
+def density_grid(x, y, grid_size=GRID_SIZE):
+    """Counts of (x, y) on a ``grid_size`` square grid as (x centers, y centers, counts[y, x])."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    valid = np.isfinite(x) & np.isfinite(y)
+    counts, x_edges, y_edges = np.histogram2d(x[valid], y[valid], bins=grid_size)
+    return (x_edges[:-1] + x_edges[1:]) / 2, (y_edges[:-1] + y_edges[1:]) / 2, counts.T
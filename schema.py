@@ -0,0 +1,80 @@
+"""Compact in-memory representation of the sales frame.
+
+Low-cardinality text columns become pandas categoricals (integer codes plus a
+small dictionary of labels) and numeric columns are downcast to the smallest
+integer type that holds them, so groupbys run on integer codes and every
+Streamlit worker keeps a much smaller frame in memory. A column whose values do
+not fit its small type keeps its wider one, a cast never wraps a value.
+"""
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+
+# text columns converted to categoricals when their cardinality is low enough
+CATEGORY_CANDIDATES = [
+    "Customer Name", "Gender", "Dealer_Name", "Company", "Model", "Engine",
+    "Transmission", "Color", "Body Style", "Dealer_Region", "Dealer_No ",
+]
+
+# maximum share of distinct values (unique / rows) for a column to be categorical
+MAX_CATEGORY_RATIO = 0.5
+
+# small integer dtypes, used when the values of the column fit
+# (Phone numbers do not fit 32 bits, the column stays int64)
+INTEGER_DTYPES = {
+    "Year": "int16",
+    "Quarter": "int8",
+    "Month": "int8",
+    "Annual Income": "int32",
+    "Price ($)": "int32",
+}
+
+
+def fits_dtype(values, dtype):
+    """True if every value of the integer Series ``values`` is in the range of the integer ``dtype``."""
+    info = np.iinfo(dtype)
+    return values.empty or bool(info.min <= values.min() and values.max() <= info.max)
+
+
+def optimize_dtypes(df, max_category_ratio=MAX_CATEGORY_RATIO):
+    """Return a copy of ``df`` with categorical and downcast integer columns."""
+    dtypes = {}
+    for col in CATEGORY_CANDIDATES:
+        if col in df.columns and df[col].nunique() <= max_category_ratio * max(len(df), 1):
+            dtypes[col] = "category"
+    for col, dtype in INTEGER_DTYPES.items():
+        if col in df.columns and fits_dtype(df[col], dtype):
+            dtypes[col] = dtype
+    return df.astype(dtypes)
+
+
+def concat_frames(frames):
+    """Concatenate frames with the columns and dtypes of the first one.
+
+    Categorical columns keep the categories of the first frame (so its codes do
+    not change) followed by the new values of the others.
+    """
+    first = frames[0]
+    columns = {}
+    for col in first.columns:
+        parts = [frame[col] for frame in frames]
+        if isinstance(first[col].dtype, pd.CategoricalDtype):
+            columns[col] = union_categoricals([part.astype("category") for part in parts])
+        else:
+            columns[col] = pd.concat(parts, ignore_index=True).astype(first[col].dtype)
+    return pd.DataFrame(columns)
+
+
+def memory_report(before, after):
+    """Per-column memory usage in bytes of two versions of the same frame."""
+    report = pd.DataFrame({
+        "before": before.memory_usage(deep=True, index=False),
+        "after": after.memory_usage(deep=True, index=False),
+        "before_dtype": before.dtypes.astype(str),
+        "after_dtype": after.dtypes.astype(str),
+    })
+    report.loc["Total", ["before", "after"]] = report[["before", "after"]].sum()
+    report[["before", "after"]] = report[["before", "after"]].astype("int64")
+    report["ratio"] = report["before"] / report["after"]
+    return report
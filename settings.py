@@ -0,0 +1,17 @@
+"""Parsing of the ``SALES_*`` environment variables shared by the modules.
+
+An unset or empty variable takes the default of the setting, a value that does
+not parse raises ValueError naming the variable.
+"""
+import os
+
+
+def env_int(name, default, minimum=0):
+    """Integer value of the environment variable ``name`` (``default`` if unset or empty), at least ``minimum``."""
+    value = os.environ.get(name, "").strip()
+    if not value:
+        return default
+    if not value.isdigit() or int(value) < minimum:
+        expected = "a positive integer" if minimum == 1 else f"an integer >= {minimum}"
+        raise ValueError(f"{name} must be {expected}, got {value!r}")
+    return int(value)
@@ -0,0 +1,239 @@
+"""Memory-mapped Arrow IPC copy of the snapshot, shared by the workers of a host.
+
+Reading the Parquet snapshot decodes it into the heap of every Streamlit
+process. Next to it, each snapshot version is written once as an uncompressed
+Arrow IPC file (named after the snapshot mtime and size, so a file always holds
+one version) with dictionary-encoded text columns. Workers memory-map it
+read-only and build the frame on top of the mapped buffers:
+
+- numeric and datetime columns are zero-copy views of the file,
+- categoricals use the dictionary indices as their codes (the indices are
+  stored with the integer width pandas uses for the codes, so they are not
+  converted), only the small dictionaries are copied,
+- other text columns (``Car_id``) stay Arrow strings (``string[pyarrow]``).
+
+The pages of the file live in the OS page cache and are shared by all
+processes, a new worker maps the file without parsing anything, and a column
+projection only touches the pages of its columns. The arrays are read-only,
+which the pages already respect (see dataset_view.py). Frames with appended
+batches are concatenated copies until the next full export.
+
+A copy only ever holds the version its name says: it is written from the same
+open file its stats come from, and a reader never maps another version under
+the requested one. DuckDB reads a version through a hard link of its Parquet
+snapshot with the same kind of name (``parquet_snapshot``), so replacing the
+snapshot does not change the rows of a query source built for the previous
+version.
+
+The workers of a host coordinate through file locks (``fcntl.flock``, released
+by the kernel when a process dies):
+
+- ``snapshot_lock`` is held while the snapshot is checked and (re)built, so
+  cold-starting workers build one version between them,
+- every process using a version holds a shared lock on its lease file
+  (``VersionLease``), ``remove_unused_versions`` only removes the files of a
+  replaced version once it can lock the lease exclusively, i.e. no process
+  uses the version any more.
+
+Without fcntl (Windows) the locks only cover the threads of a process and the
+files of old versions are kept.
+"""
+import contextlib
+import os
+import re
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+def arrow_path_for(snapshot_path, mtime_ns, size):
+    """Path of the Arrow copy of the snapshot version (path, mtime, size)."""
+    return f"{os.path.splitext(snapshot_path)[0]}.{mtime_ns}-{size}.arrow"
+
+
+def parquet_path_for(snapshot_path, mtime_ns, size):
+    """Path of the Parquet link of the snapshot version (path, mtime, size)."""
+    return f"{os.path.splitext(snapshot_path)[0]}.{mtime_ns}-{size}.parquet"
+
+
+def lease_path_for(snapshot_path, mtime_ns, size):
+    """Path of the lease file of the snapshot version (path, mtime, size)."""
+    return f"{os.path.splitext(snapshot_path)[0]}.{mtime_ns}-{size}.lease"
+
+
+# suffix of the per-version files after the snapshot stem
+_VERSION_SUFFIX = re.compile(r"\.(\d+)-(\d+)\.(?:arrow|parquet|lease)")
+
+_thread_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def snapshot_lock(snapshot_path):
+    """Exclusive lock of the snapshot for the threads and the processes of the host."""
+    with _thread_lock, open(f"{snapshot_path}.lock", "a") as lock_file:
+        if fcntl is not None:
+            # released when the file is closed
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+class VersionLease:
+    """Shared lock on the lease file of a snapshot version, its files stay while a process holds one."""
+
+    def __init__(self, snapshot_path, mtime_ns, size):
+        self._file = open(lease_path_for(snapshot_path, mtime_ns, size), "a")
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_SH)
+
+    def close(self):
+        self._file.close()
+
+
+def _version_gone(path, snapshot_path):
+    return FileNotFoundError(f"Snapshot version {path} is no longer available, {snapshot_path} was replaced")
+
+
+def _index_type(n_values):
+    # same widths as the codes of a pandas Categorical
+    for dtype, arrow_type in ((np.int8, pa.int8()), (np.int16, pa.int16()), (np.int32, pa.int32())):
+        if n_values < np.iinfo(dtype).max:
+            return arrow_type
+    return pa.int64()
+
+
+def ipc_table(table):
+    """``table`` as one chunk per column, dictionaries unified and indices as wide as pandas codes."""
+    table = table.unify_dictionaries().combine_chunks()
+    columns = []
+    for column in table.columns:
+        if pa.types.is_dictionary(column.type):
+            n_values = len(column.chunk(0).dictionary) if column.num_chunks else 0
+            column = column.cast(pa.dictionary(_index_type(n_values), column.type.value_type))
+        columns.append(column)
+    return pa.table(columns, names=table.column_names).replace_schema_metadata(table.schema.metadata)
+
+
+def write_arrow_snapshot(snapshot_path):
+    """Write the Arrow copy of the current snapshot if it does not exist yet, return its path.
+
+    The name and the rows come from the same open file, so the copy matches its
+    name even if the snapshot is replaced meanwhile. Copies of older versions
+    are kept, see ``remove_unused_versions``.
+    """
+    with open(snapshot_path, "rb") as snapshot:
+        stat = os.fstat(snapshot.fileno())
+        arrow_path = arrow_path_for(snapshot_path, stat.st_mtime_ns, stat.st_size)
+        if not os.path.exists(arrow_path):
+            table = ipc_table(pq.read_table(snapshot))
+            # write to a temporary file first so readers never map a half written copy
+            tmp_path = f"{arrow_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(tmp_path, arrow_path)
+    return arrow_path
+
+
+def link_parquet_snapshot(snapshot_path):
+    """Hard link the current snapshot under its version name, return the path of the link."""
+    tmp_path = f"{snapshot_path}.{os.getpid()}.{threading.get_ident()}.link"
+    os.link(snapshot_path, tmp_path)
+    try:
+        # the link has the stats of the file it points to, so it is named after the version it holds
+        stat = os.stat(tmp_path)
+        path = parquet_path_for(snapshot_path, stat.st_mtime_ns, stat.st_size)
+        try:
+            os.link(tmp_path, path)
+        except FileExistsError:
+            pass  # linked by another worker
+    finally:
+        os.remove(tmp_path)
+    return path
+
+
+def parquet_snapshot(snapshot_path, mtime_ns, size):
+    """Path of the Parquet link of the snapshot version (linked first if it is the current snapshot).
+
+    Raises FileNotFoundError if the version was replaced and its link is gone.
+    """
+    path = parquet_path_for(snapshot_path, mtime_ns, size)
+    if not os.path.exists(path) and link_parquet_snapshot(snapshot_path) != path:
+        raise _version_gone(path, snapshot_path)
+    return path
+
+
+def _remove_version(snapshot_path, mtime_ns, size):
+    with open(lease_path_for(snapshot_path, mtime_ns, size), "a") as lease:
+        try:
+            fcntl.flock(lease, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False  # a process still uses the version
+        # the lease file goes last, a process taking a lease meanwhile finds the copy gone
+        for path in (arrow_path_for(snapshot_path, mtime_ns, size), parquet_path_for(snapshot_path, mtime_ns, size),
+                     lease.name):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    return True
+
+
+def remove_unused_versions(snapshot_path):
+    """Remove the Arrow copy, Parquet link and lease of every replaced version no process leases.
+
+    Returns the removed (mtime, size) versions. The current snapshot is kept, and
+    processes that mapped a removed copy keep their mapping. Versions of workers
+    that died are removed too, their locks went with them.
+    """
+    if fcntl is None:
+        return []
+    directory = os.path.dirname(os.path.abspath(snapshot_path))
+    stem = os.path.basename(os.path.splitext(snapshot_path)[0])
+    removed = []
+    # under the snapshot lock, so a version being built is already the current one
+    with snapshot_lock(snapshot_path):
+        try:
+            stat = os.stat(snapshot_path)
+            current = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            current = None
+        versions = set()
+        for name in os.listdir(directory):
+            match = name.startswith(f"{stem}.") and _VERSION_SUFFIX.fullmatch(name[len(stem):])
+            if match:
+                versions.add((int(match[1]), int(match[2])))
+        for version in sorted(versions - {current}):
+            if _remove_version(snapshot_path, *version):
+                removed.append(version)
+    return removed
+
+
+def table_to_frame(table):
+    """DataFrame on the buffers of ``table`` (see the module docstring for what is copied)."""
+    return table.to_pandas(split_blocks=True, types_mapper={pa.string(): pd.ArrowDtype(pa.string())}.get)
+
+
+def read_arrow_snapshot(snapshot_path, mtime_ns, size, columns=None):
+    """Frame of the snapshot version (path, mtime, size) mapped from its Arrow copy.
+
+    The copy is written first if it is missing and the version is the current
+    snapshot. Raises FileNotFoundError if the version was replaced and its copy
+    is gone, the current data is never returned under an older version.
+    """
+    arrow_path = arrow_path_for(snapshot_path, mtime_ns, size)
+    try:
+        source = pa.memory_map(arrow_path, "r")
+    except FileNotFoundError:
+        # first reader of this version (or a snapshot written before the Arrow copies existed)
+        if write_arrow_snapshot(snapshot_path) != arrow_path:
+            raise _version_gone(arrow_path, snapshot_path) from None
+        source = pa.memory_map(arrow_path, "r")
+    table = pa.ipc.open_file(source).read_all()
+    return table_to_frame(table.select(list(columns)) if columns else table)
@@ -0,0 +1,47 @@
+"""The snapshot follows the CSV it was built from and carries its profile."""
+import os
+
+import numpy as np
+import pandas as pd
+
+import data_loader
+from data_profile import build_profile
+
+
+SOURCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "car sales.csv")
+
+
+def test_csv_replaced_by_an_older_file_rebuilds_the_snapshot(tmp_path):
+    path = str(tmp_path / "car sales.csv")
+    backup = str(tmp_path / "backup.csv")
+    pd.read_csv(SOURCE, dtype=str, nrows=810).to_csv(backup, index=False)
+    os.utime(backup, ns=(10**18, 10**18))
+    pd.read_csv(SOURCE, dtype=str, nrows=2030).to_csv(path, index=False)
+    n_rows = len(data_loader.load_sales_data(path))
+
+    # restored with its old mtime (cp -p, rsync, a checkout)
+    os.replace(backup, path)
+    assert os.stat(path).st_mtime_ns < os.stat(data_loader.snapshot_path_for(path)).st_mtime_ns
+    assert data_loader.snapshot_is_stale(path)
+    assert len(data_loader.load_sales_data(path)) == len(data_loader.read_csv_data(path)) < n_rows
+    assert not data_loader.snapshot_is_stale(path)
+
+
+def test_profile_is_read_from_the_snapshot(tmp_path, monkeypatch):
+    path = str(tmp_path / "car sales.csv")
+    pd.read_csv(SOURCE, dtype=str, nrows=3000).to_csv(path, index=False)
+    expected = build_profile(pd.read_csv(path, dtype=data_loader.CSV_DTYPES))
+    data_loader.ensure_snapshot(path)
+
+    # another worker: the profile comes with the snapshot, the CSV is not parsed again
+    monkeypatch.setattr(pd, "read_csv", None)
+    profile = data_loader.load_data_profile(path)
+    assert profile.n_rows == expected.n_rows == 3000
+    pd.testing.assert_frame_equal(profile.sample, expected.sample, check_index_type=False)
+    pd.testing.assert_series_equal(profile.missing, expected.missing)
+    pd.testing.assert_series_equal(profile.gender_counts, expected.gender_counts)
+    pd.testing.assert_frame_equal(profile.outlier_bounds, expected.outlier_bounds)
+    for col, (counts, edges) in expected.histograms.items():
+        np.testing.assert_array_equal(profile.histograms[col][0], counts)
+        np.testing.assert_array_equal(profile.histograms[col][1], edges)
+        np.testing.assert_array_equal(profile.densities[col][1], expected.densities[col][1])
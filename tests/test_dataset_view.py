@@ -0,0 +1,79 @@
+"""The pages only read the shared frame: write_guard passes for them and catches in-place writes."""
+import os
+
+import pandas as pd
+import pytest
+
+import page_data
+from cube import SalesCube
+from data_loader import read_csv_data
+from dataset_view import DatasetView, write_guard
+
+
+SOURCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "car sales.csv")
+
+
+@pytest.fixture(scope="module")
+def shared():
+    return read_csv_data(SOURCE)
+
+
+@pytest.fixture(autouse=True)
+def copy_on_write():
+    # as in app.py (dataset_view.enable_copy_on_write)
+    with pd.option_context("mode.copy_on_write", True):
+        yield
+
+
+def run_pages(view, source):
+    page_data.sales_metrics(source, view["Price ($)"])
+    for time_dimension in ("Year", "Quarter", "Month"):
+        page_data.sales_over_time(source, time_dimension)
+    page_data.quarterly_comparison(source)
+    page_data.monthly_revenue(source)
+    page_data.customer_metrics(source, view["Customer Name"])
+    page_data.color_share(source)
+    page_data.brand_sales(source, others=True)
+    page_data.gender_body_style(source)
+    page_data.dealer_metrics(source)
+    page_data.dealer_sales(source, others=True)
+    page_data.company_model_sales(source)
+    page_data.region_sales(source)
+    page_data.region_monthly_share(source)
+
+
+@pytest.mark.parametrize("filters", [{}, {"Dealer_Region": ["Austin"], "Year": [2023]}])
+def test_pages_do_not_write_the_shared_frame(shared, filters):
+    mask = pd.Series(True, index=shared.index)
+    for column, values in filters.items():
+        mask &= shared[column].isin(values)
+    with write_guard(shared, "sales frame"):
+        view = DatasetView(shared)[mask.to_numpy()]
+        run_pages(view, SalesCube.from_frame(view.to_frame()))
+        # plotting code may change its own copy
+        frame = view.to_frame(["Company", "Price ($)"])
+        frame["Price ($)"] = 0
+
+
+def set_column(frame):
+    frame["x"] = 1
+
+
+def set_loc(frame):
+    frame.loc[frame.index[0], "Price ($)"] = 0
+
+
+@pytest.mark.parametrize("write", [set_column, set_loc])
+def test_write_guard_catches_in_place_writes(shared, write):
+    frame = shared.copy()
+    with pytest.raises(RuntimeError, match="modified in place"):
+        with write_guard(frame):
+            write(frame)
+
+
+def test_view_rejects_writes(shared):
+    view = DatasetView(shared)
+    with pytest.raises(TypeError):
+        view["x"] = 1
+    with pytest.raises(AttributeError):
+        view.frame = shared
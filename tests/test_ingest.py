@@ -0,0 +1,122 @@
+"""Appended batches are validated against the snapshot schema and extend the loaded data."""
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_loader
+from cube import CUBE_COLUMNS, ROLLUP_DIMENSIONS, SalesCube
+from filter_index import INDEX_COLUMNS, BitmapIndex
+from ingest import append_batch
+from schema import optimize_dtypes
+
+
+SOURCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "car sales.csv")
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = str(tmp_path / "car sales.csv")
+    pd.read_csv(SOURCE, dtype=str, nrows=2000).to_csv(path, index=False)
+    return path
+
+
+def batch(n_rows=20, skip=2000, **values):
+    """CSV buffer of ``n_rows`` source rows not in the test CSV, dated 15/06/2023, with the given column values."""
+    rows = pd.read_csv(SOURCE, dtype=str, skiprows=range(1, skip + 1), nrows=n_rows)
+    rows = rows.assign(**{"Date": "15/06/2023", **values})
+    return io.StringIO(rows.to_csv(index=False))
+
+
+def test_integers_out_of_range_keep_a_wide_dtype():
+    df = optimize_dtypes(pd.DataFrame({
+        "Phone": [8005551234, 1], "Annual Income": [3_000_000_000, 1], "Year": [2022, 2023],
+    }))
+    assert df["Phone"].tolist() == [8005551234, 1]
+    assert df["Annual Income"].tolist() == [3_000_000_000, 1]
+    assert df["Year"].dtype == "int16"
+
+
+def test_batch_out_of_the_snapshot_range_is_rejected(csv_path):
+    with pytest.raises(ValueError, match="Annual Income"):
+        append_batch(batch(**{"Annual Income": "3000000000"}), csv_path)
+    assert data_loader.append_parts(csv_path) == []
+    # Phone is stored as int64, a full phone number is appended as is
+    assert append_batch(batch(Phone="8005551234"), csv_path) == 20
+    df = data_loader.load_sales_data(csv_path, columns=["Phone"])
+    assert (df["Phone"].tail(20) == 8005551234).all()
+
+
+def normalized(frame, by):
+    return frame.astype({col: str for col in by}).sort_values(by).reset_index(drop=True)
+
+
+def test_appended_rows_are_selected_and_counted(csv_path):
+    before = data_loader.load_query_backend(csv_path, "pandas").summary()
+    data_loader.load_filter_index(csv_path)
+    new = pd.read_csv(batch(Dealer_Region="Austin"))
+    assert append_batch(batch(Dealer_Region="Austin"), csv_path) == 20
+
+    filters = {"Year": [2023], "Dealer_Region": ["Austin"]}
+    df = data_loader.load_sales_data(csv_path, columns=CUBE_COLUMNS)
+    selected = data_loader.load_filter_index(csv_path).select(df, filters)
+    expected = df[(df["Year"] == 2023) & (df["Dealer_Region"] == "Austin")]
+    assert selected.index.tolist() == expected.index.tolist()
+    assert selected.tail(20)["Price ($)"].tolist() == new["Price ($)"].tolist()
+
+    for backend in ("pandas", "duckdb"):
+        after = data_loader.load_query_backend(csv_path, backend).summary()
+        assert after["count"] == before["count"] + 20
+        assert after["price_sum"] == before["price_sum"] + new["Price ($)"].sum()
+        assert data_loader.load_query_backend(csv_path, backend).where(filters).summary()["count"] == len(expected)
+
+
+def test_new_category_values_extend_the_bitmaps(csv_path):
+    values = data_loader.load_filter_index(csv_path).values("Dealer_Region")
+    append_batch(batch(n_rows=13, Dealer_Region="Nowhere"), csv_path)
+    index = data_loader.load_filter_index(csv_path)
+    assert index.values("Dealer_Region") == values + ["Nowhere"]
+    df = data_loader.load_sales_data(csv_path, columns=INDEX_COLUMNS)
+    assert index.rows({"Dealer_Region": ["Nowhere"]}).tolist() == list(range(len(df) - 13, len(df)))
+    assert data_loader.load_query_backend(csv_path, "pandas").where({"Dealer_Region": ["Nowhere"]}).summary()["count"] == 13
+
+
+@pytest.mark.parametrize("split", [1, 13, 16, 999])
+def test_appended_index_matches_a_full_build(csv_path, split):
+    df = data_loader.read_csv_data(csv_path)
+    df = df.assign(Dealer_Region=df["Dealer_Region"].cat.add_categories("Nowhere"))
+    df.loc[df.index[-3:], "Dealer_Region"] = "Nowhere"
+    full = BitmapIndex(df)
+    appended = BitmapIndex(df.iloc[:split]).append(df.iloc[split:])
+    assert appended.n_rows == full.n_rows
+    for col in INDEX_COLUMNS:
+        assert appended.bitmaps[col].keys() == full.bitmaps[col].keys()
+        for value, bits in full.bitmaps[col].items():
+            np.testing.assert_array_equal(appended.bitmaps[col][value], bits, err_msg=f"{col}={value}")
+
+
+def test_merged_cube_matches_a_full_build(csv_path):
+    df = data_loader.read_csv_data(csv_path)
+    full = SalesCube.from_frame(df)
+    merged = SalesCube.from_frame(df.iloc[:700]).merge(SalesCube.from_frame(df.iloc[700:]))
+    assert merged.summary() == full.summary()
+    for by in [["Year", "Dealer_Region"], ["Company", "Model"]] + list(ROLLUP_DIMENSIONS.values()):
+        pd.testing.assert_frame_equal(normalized(merged.rollup(by), by), normalized(full.rollup(by), by))
+    pd.testing.assert_frame_equal(
+        normalized(merged.price_quantile([0.25, 0.5], by="Company"), ["Company"]),
+        normalized(full.price_quantile([0.25, 0.5], by="Company"), ["Company"]),
+    )
+
+
+@pytest.mark.parametrize("source, match", [
+    (lambda: batch().getvalue().replace("Price ($)", "Price"), "missing columns"),
+    (lambda: batch(**{"Price ($)": "cheap"}).getvalue(), "sales schema"),
+    (lambda: batch(Region="Austin").getvalue(), "unexpected columns: \\['Region'\\]"),
+    (lambda: batch(**{"Price ($)": "-3000000000"}).getvalue(), "out of the range"),
+])
+def test_invalid_batches_are_rejected(csv_path, source, match):
+    with pytest.raises(ValueError, match=match):
+        append_batch(io.StringIO(source()), csv_path)
+    assert data_loader.append_parts(csv_path) == []
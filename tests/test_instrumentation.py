@@ -0,0 +1,44 @@
+"""The rerun latencies reach the latency log."""
+import json
+import logging
+
+import pytest
+
+import instrumentation
+from instrumentation import LatencyStats, RerunProfile
+
+
+@pytest.fixture
+def fresh_logger(monkeypatch):
+    logger = instrumentation.logger
+    monkeypatch.setattr(logger, "handlers", [])
+    monkeypatch.setattr(logger, "level", logging.NOTSET)
+    yield logger
+    for handler in logger.handlers:
+        handler.close()
+
+
+def finish_rerun():
+    profile = RerunProfile("Sales Trend")
+    with profile.span("load"):
+        pass
+    return profile.finish(LatencyStats())
+
+
+def test_rerun_is_logged(fresh_logger, caplog):
+    finish_rerun()
+    records = [record for record in caplog.records if record.name == "sales_dashboard.latency"]
+    assert len(records) == 1
+    assert records[0].levelno == logging.INFO
+    line = json.loads(records[0].getMessage())
+    assert line["page"] == "Sales Trend" and line["spans"][0]["name"] == "load"
+
+
+def test_latency_log_file(fresh_logger, tmp_path, monkeypatch):
+    path = tmp_path / "latency.log"
+    monkeypatch.setenv("SALES_LATENCY_LOG", str(path))
+    finish_rerun()
+    finish_rerun()
+    fresh_logger.handlers[0].flush()
+    assert len(fresh_logger.handlers) == 1
+    assert path.read_text().count('"page": "Sales Trend"') == 2
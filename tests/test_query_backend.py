@@ -0,0 +1,115 @@
+"""Both query backends answer the page aggregations with the same values and shapes."""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cube import ROLLUP_DIMENSIONS, SalesCube
+from data_loader import read_csv_data
+from page_data import dealer_sales, sales_metrics
+from query_backend import DuckDBSource
+
+
+SOURCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "car sales.csv")
+FILTERS = [
+    {},
+    {"Dealer_Region": ["Austin"], "Year": [2023]},
+    {"Company": ["Ford", "Dodge"], "Transmission": ["Auto"], "Color": ["Black", "Red"]},
+    {"Company": ["No such company"]},
+]
+
+
+@pytest.fixture(scope="module")
+def backends(tmp_path_factory):
+    df = read_csv_data(SOURCE)
+    path = str(tmp_path_factory.mktemp("snapshot") / "car sales.parquet")
+    df.to_parquet(path, engine="pyarrow", index=False)
+    return SalesCube.from_frame(df), DuckDBSource(path)
+
+
+@pytest.fixture(params=FILTERS, ids=[f"filters{i}" for i in range(len(FILTERS))])
+def filters(request):
+    return request.param
+
+
+@pytest.fixture
+def sources(filters, backends):
+    return [backend.where(filters) for backend in backends]
+
+
+def normalized(frame, by):
+    return frame.astype({col: str for col in by}).sort_values(by).reset_index(drop=True).astype({"count": "int64"})
+
+
+def test_summary(sources):
+    cube, duck = (source.summary() for source in sources)
+    assert cube.keys() == duck.keys()
+    for key in cube:
+        assert (np.isnan(cube[key]) and np.isnan(duck[key])) or cube[key] == duck[key], key
+
+
+@pytest.mark.parametrize("by", [["Dealer_Region"], ["Year", "Quarter"], ["Company", "Model"]])
+def test_rollup(sources, by):
+    cube, duck = (normalized(source.rollup(by), by) for source in sources)
+    pd.testing.assert_frame_equal(cube, duck, check_dtype=False)
+
+
+def test_top_distinct_and_kpis(sources, filters):
+    cube, duck = sources
+    # the dealers are only rolled up with the sidebar filters
+    dealers = set(filters) <= set(ROLLUP_DIMENSIONS["dealers"])
+    if not dealers:
+        with pytest.raises(KeyError):
+            cube.rollup("Dealer_Name")
+    for dimension in ("Company", "Dealer_Name", "Color") if dealers else ("Company", "Color"):
+        if cube.summary()["count"]:
+            assert cube.top_value(dimension) == duck.top_value(dimension)
+        assert cube.distinct(dimension) == duck.distinct(dimension)
+        assert cube.distinct_values(dimension) == duck.distinct_values(dimension)
+    top, distinct = ("Company", "Model", "Dealer_Region"), ("Company", "Dealer_Name") if dealers else ("Company",)
+    cube_kpis, duck_kpis = (source.kpis(top=top, distinct=distinct) for source in sources)
+    assert cube_kpis["top"] == duck_kpis["top"]
+    assert cube_kpis["distinct"] == duck_kpis["distinct"]
+    assert cube_kpis["count"] == duck_kpis["count"] and cube_kpis["price_sum"] == duck_kpis["price_sum"]
+
+
+@pytest.mark.parametrize("q", [0.5, [0.25, 0.75], np.array([0.1, 0.5, 0.9]), np.float64(0.5)])
+def test_price_quantile_shapes(sources, q):
+    cube, duck = (source.price_quantile(q) for source in sources)
+    assert np.shape(cube) == np.shape(duck) == np.shape(q)
+    if not np.isnan(cube).any():
+        # the cube interpolates a histogram sketch, adjacent bin edges are ~5.5% apart
+        np.testing.assert_allclose(cube, duck, rtol=0.05)
+
+
+def test_price_quantile_by(sources):
+    cube, duck = (source.price_quantile([0.25, 0.75], by="Company") for source in sources)
+    assert list(cube.columns) == list(duck.columns) == ["Company", 0.25, 0.75]
+    assert cube["Company"].astype(str).tolist() == duck["Company"].astype(str).tolist()
+
+
+def test_ties_in_label_order(backends):
+    # categories in first seen order, as after an append, must not decide the ties
+    cube, duck = backends
+    frame = read_csv_data(SOURCE)
+    for dimension in ("Company", "Dealer_Name", "Model"):
+        frame[dimension] = frame[dimension].cat.reorder_categories(frame[dimension].cat.categories[::-1])
+    appended = SalesCube.from_frame(frame).where(FILTERS[1])
+    duck = duck.where(FILTERS[1])
+    counts = appended.rollup("Dealer_Name").set_index("Dealer_Name")["count"]
+    assert (counts == counts.max()).sum() > 1
+    for dimension in ("Company", "Dealer_Name", "Model"):
+        assert appended.top_value(dimension) == duck.top_value(dimension) == cube.where(FILTERS[1]).top_value(dimension)
+    assert appended.kpis(top=("Company", "Dealer_Name"))["top"] == duck.kpis(top=("Company", "Dealer_Name"))["top"]
+    ranked = [dealer_sales(source, n=3)["Dealer_Name"].tolist() for source in (appended, duck)]
+    assert ranked[0] == ranked[1]
+
+
+def test_median_is_approximated_only_from_a_precomputed_sketch(backends, monkeypatch):
+    monkeypatch.setenv("SALES_APPROX_KPI_ROWS", "0")
+    prices = read_csv_data(SOURCE)["Price ($)"]
+    cube, duck = (sales_metrics(backend, prices)["median_price"] for backend in backends)
+    assert duck == prices.median()
+    assert cube != prices.median()
+    assert cube == pytest.approx(prices.median(), rel=0.05)
@@ -0,0 +1,128 @@
+"""A rerun pinned to a published version keeps its data while a new version is swapped in."""
+import glob
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import streamlit as st
+
+import data_loader
+from refresh import DatasetRefresher
+from shared_snapshot import arrow_path_for, parquet_path_for, remove_unused_versions
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE = os.path.join(REPO_ROOT, "car sales.csv")
+PROJECTION = ("Year", "Dealer_Region", "Customer Name", "Company", "Model", "Annual Income", "Price ($)")
+
+
+def write_rows(path, n_rows):
+    pd.read_csv(SOURCE, dtype=str, nrows=n_rows).to_csv(path, index=False)
+    # a new version even on filesystems with a coarse mtime
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + n_rows))
+
+
+def refresher_for(path):
+    return DatasetRefresher(
+        signature=lambda: data_loader.source_signature(path),
+        build=lambda: data_loader.warm_dataset(path, [PROJECTION]),
+        release=lambda version: data_loader.release_dataset(version, [PROJECTION]),
+        interval=0,
+    )
+
+
+def pinned_data(path, version):
+    df = data_loader.load_sales_data(path, columns=PROJECTION, version=version)
+    index = data_loader.load_filter_index(path, version=version)
+    return df, index
+
+
+def test_swap_during_pinned_rerun(tmp_path):
+    path = str(tmp_path / "car sales.csv")
+    write_rows(path, 4000)
+    refresher = refresher_for(path)
+    pinned = refresher.current()
+    df, index = pinned_data(path, pinned.version)
+    n_rows = len(df)
+    profile_rows = data_loader.load_data_profile(path, signature=pinned.signature[0])
+
+    # the source is replaced and the new version published while the rerun still holds the old one
+    write_rows(path, 2000)
+    assert refresher.refresh()
+    assert refresher.current().version != pinned.version
+
+    # the caches evict the entries of the pinned version (or are cleared)
+    st.cache_resource.clear()
+
+    df, index = pinned_data(path, pinned.version)
+    assert len(df) == n_rows
+    assert len(index.select(df, {"Dealer_Region": ["Austin"]})) == (df["Dealer_Region"] == "Austin").sum()
+    for backend in ("pandas", "duckdb"):
+        source = data_loader.load_query_backend(path, backend=backend, version=pinned.version)
+        assert source.summary()["count"] == n_rows
+    assert data_loader.load_data_profile(path, signature=pinned.signature[0]) is profile_rows
+
+
+def test_pinned_version_is_released_after_the_swap(tmp_path):
+    path = str(tmp_path / "car sales.csv")
+    write_rows(path, 3000)
+    refresher = refresher_for(path)
+    old = refresher.current().version
+    old_files = [arrow_path_for(*old[:3]), parquet_path_for(*old[:3])]
+    assert all(os.path.exists(path) for path in old_files)
+
+    write_rows(path, 1500)
+    refresher.refresh()
+    # no rerun holds the old handle any more, its structures and its version files are released
+    assert not any(os.path.exists(path) for path in old_files)
+    df, _ = pinned_data(path, refresher.current().version)
+    assert len(df) == len(data_loader.read_csv_data(path))
+
+
+def worker(code):
+    """Another Streamlit worker of the host: a Python process running ``code`` with the repository modules."""
+    return subprocess.Popen([sys.executable, "-c", code], cwd=REPO_ROOT, text=True,
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+
+def test_cold_start_builds_one_version(tmp_path):
+    path = str(tmp_path / "car sales.csv")
+    write_rows(path, 3000)
+    workers = [worker(f"import data_loader; print(data_loader.dataset_version({path!r}))") for _ in range(6)]
+    versions = {process.communicate(timeout=120)[0] for process in workers}
+    assert len(versions) == 1
+    assert len(glob.glob(str(tmp_path / "*.arrow"))) == 1
+    # no temporary file is left next to the snapshot
+    assert not glob.glob(str(tmp_path / "*.link")) and not glob.glob(str(tmp_path / "*.tmp"))
+
+
+def test_version_used_by_another_worker_is_kept(tmp_path):
+    path = str(tmp_path / "car sales.csv")
+    write_rows(path, 3000)
+    refresher = refresher_for(path)
+    old = refresher.current().version
+    old_files = [arrow_path_for(*old[:3]), parquet_path_for(*old[:3])]
+    n_rows = len(pinned_data(path, old)[0])
+
+    # a second worker publishes the same version and keeps serving it
+    other = worker(
+        "import data_loader, sys\n"
+        f"version, resources = data_loader.warm_dataset({path!r})\n"
+        "print('ready', flush=True)\n"
+        "sys.stdin.readline()\n"
+        f"print(data_loader.load_query_backend({path!r}, backend='duckdb', version=version).summary()['count'])\n"
+    )
+    assert other.stdout.readline().strip() == "ready"
+
+    write_rows(path, 1500)
+    refresher.refresh()
+    # released here, but the other worker still leases it
+    assert all(os.path.exists(path) for path in old_files)
+    # and queries it from its Parquet link
+    assert int(other.communicate("\n", timeout=120)[0]) == n_rows
+
+    # the worker is gone, so is its lease
+    assert old[1:3] in remove_unused_versions(data_loader.snapshot_path_for(path))
+    assert not any(os.path.exists(path) for path in old_files)
@@ -0,0 +1,30 @@
+"""Integer settings read from the environment."""
+import pytest
+
+from figure_cache import chart_workers
+from kpi import DEFAULT_APPROX_ROWS, approx_rows
+from ranking import DEFAULT_TOP_N, ranking_size
+from scatter_sampling import POINT_BUDGET, point_budget
+from settings import env_int
+
+
+@pytest.mark.parametrize("value", [None, "", "  "])
+def test_unset_or_empty_takes_the_default(monkeypatch, value):
+    for name in ("SALES_SCATTER_POINT_BUDGET", "SALES_TOP_N", "SALES_APPROX_KPI_ROWS", "SALES_CHART_WORKERS"):
+        if value is None:
+            monkeypatch.delenv(name, raising=False)
+        else:
+            monkeypatch.setenv(name, value)
+    assert point_budget() == POINT_BUDGET
+    assert ranking_size() == DEFAULT_TOP_N
+    assert approx_rows() == DEFAULT_APPROX_ROWS
+    assert chart_workers() >= 1
+
+
+def test_values_are_parsed_and_checked(monkeypatch):
+    monkeypatch.setenv("SALES_TEST_INT", " 12 ")
+    assert env_int("SALES_TEST_INT", 3) == 12
+    for value, minimum in [("0", 1), ("-1", 0), ("1.5", 0), ("ten", 0)]:
+        monkeypatch.setenv("SALES_TEST_INT", value)
+        with pytest.raises(ValueError, match="SALES_TEST_INT"):
+            env_int("SALES_TEST_INT", 3, minimum)
@@ -0,0 +1,31 @@
+"""Calendar fields derived from day ordinals match pandas."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from time_dimension import period_codes, period_labels, time_columns
+
+
+@pytest.fixture(scope="module")
+def frame():
+    dates = pd.Series(pd.date_range("1999-12-20", "2031-01-10", freq="D"))
+    days = dates.to_numpy(dtype="datetime64[D]").astype(np.int64)
+    return pd.DataFrame({"Date": dates, **time_columns(days)})
+
+
+def test_only_the_stored_columns_are_computed(frame):
+    assert list(time_columns(np.array([0]))) == ["Year", "Quarter", "Month"]
+    assert (frame["Quarter"] == frame["Date"].dt.quarter).all()
+
+
+def test_year_month_and_week_codes(frame):
+    dates = frame["Date"]
+    iso = dates.dt.isocalendar()
+    assert (period_codes(frame, "YearMonth") == dates.dt.year * 100 + dates.dt.month).all()
+    assert (period_codes(frame, "Week") == iso["year"] * 100 + iso["week"]).all()
+    assert period_labels(frame.iloc[[0, 14]], "Week").tolist() == ["1999-W51", "2000-W01"]
+
+
+def test_week_needs_the_dates(frame):
+    with pytest.raises(ValueError, match="Date"):
+        period_codes(frame.drop(columns="Date"), "Week")
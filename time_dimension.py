@@ -0,0 +1,120 @@
+"""Time dimension shared by the data loader and the pages.
+
+Dates are parsed once into int64 day ordinals (days since 1970-01-01) and
+every calendar field is derived from the ordinals with integer arithmetic,
+without datetime objects or string conversions:
+
+- ``Year`` (int16), ``Quarter`` (int8), ``Month`` (int8), the stored columns
+- ``YearMonth`` (year * 100 + month, e.g. 202203), from Year and Month
+- ``Week`` (ISO year * 100 + ISO week, e.g. 202205), from the Date column
+
+Only the stored columns are computed for every row, ``period_codes`` derives
+YearMonth and Week codes when a page asks for them.
+
+Pages label periods with ``period_labels``, which formats each distinct
+period once and looks the labels up for the rows, so aggregated frames never
+go through ``astype(str)`` or ``pd.to_datetime`` per row.
+"""
+import numpy as np
+import pandas as pd
+
+
+DATE_FORMAT = "%d/%m/%Y"
+
+# ordinal of dates that do not parse (the int64 value of NaT)
+MISSING_DAY = np.iinfo(np.int64).min
+
+TIME_COLUMNS = ["Year", "Quarter", "Month"]
+
+MONTH_ABBR = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+# label of a period code per dimension
+PERIOD_LABELS = {
+    "Year": lambda code: f"{code}",
+    "Quarter": lambda code: f"{code // 10} Q{code % 10}",
+    "Month": lambda code: f"{MONTH_ABBR[code % 100 - 1]} {code // 100}",
+    "YearMonth": lambda code: f"{code // 100}-{code % 100:02d}",
+    "Week": lambda code: f"{code // 100}-W{code % 100:02d}",
+}
+
+
+def parse_dates(values, date_format=DATE_FORMAT):
+    """Day ordinals of date strings, ``MISSING_DAY`` where a value does not parse."""
+    dates = pd.to_datetime(values, format=date_format, errors="coerce")
+    return np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+
+
+def to_datetime(days):
+    """datetime64[ns] array of day ordinals."""
+    return np.asarray(days, dtype=np.int64).astype("datetime64[D]").astype("datetime64[ns]")
+
+
+def civil_from_days(days):
+    """(year, month, day) arrays of day ordinals (proleptic Gregorian calendar)."""
+    # H. Hinnant's civil_from_days, eras of 400 years starting on 0000-03-01
+    z = np.asarray(days, dtype=np.int64) + 719468
+    era = z // 146097
+    doe = z - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    day = doy - (153 * mp + 2) // 5 + 1
+    month = np.where(mp < 10, mp + 3, mp - 9)
+    year = yoe + era * 400 + (month <= 2)
+    return year, month, day
+
+
+def days_from_january_first(year):
+    """Day ordinals of January 1st of ``year``."""
+    y = np.asarray(year, dtype=np.int64) - 1  # January counts as month 13 of the previous year
+    era = y // 400
+    yoe = y - era * 400
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + 306
+    return era * 146097 + doe - 719468
+
+
+def iso_week(days):
+    """ISO year * 100 + ISO week of day ordinals."""
+    days = np.asarray(days, dtype=np.int64)
+    # 1970-01-01 was a Thursday, the ISO week belongs to the year of its Thursday
+    thursday = days - (days + 3) % 7 + 3
+    year, _, _ = civil_from_days(thursday)
+    return year * 100 + (thursday - days_from_january_first(year)) // 7 + 1
+
+
+def time_columns(days):
+    """Calendar columns (see ``TIME_COLUMNS``) of day ordinals as compact integer arrays."""
+    year, month, _ = civil_from_days(days)
+    return {
+        "Year": year.astype(np.int16),
+        "Quarter": ((month - 1) // 3 + 1).astype(np.int8),
+        "Month": month.astype(np.int8),
+    }
+
+
+def period_codes(frame, dimension):
+    """Integer period codes of the rows of ``frame`` for a dimension of ``PERIOD_LABELS``.
+
+    Codes are built from the Year/Quarter/Month columns, ``Week`` from the day
+    ordinals of the Date column (so it is not available on rollups).
+    """
+    if dimension == "Week":
+        if "Date" not in frame:
+            raise ValueError("Week periods need the Date column of the rows")
+        return iso_week(frame["Date"].to_numpy(dtype="datetime64[D]").astype(np.int64))
+    year = frame["Year"].to_numpy(dtype=np.int64)
+    if dimension == "Year":
+        return year
+    if dimension == "Quarter":
+        return year * 10 + frame["Quarter"].to_numpy(dtype=np.int64)
+    if dimension in ("Month", "YearMonth"):
+        return year * 100 + frame["Month"].to_numpy(dtype=np.int64)
+    raise ValueError(f"Unknown time dimension {dimension!r}, expected one of {list(PERIOD_LABELS)}")
+
+
+def period_labels(frame, dimension):
+    """Labels of the periods of the rows of ``frame``, each distinct period is formatted once."""
+    codes = period_codes(frame, dimension)
+    uniques, inverse = np.unique(codes, return_inverse=True)
+    lookup = np.array([PERIOD_LABELS[dimension](int(code)) for code in uniques], dtype=object)
+    return lookup[inverse]